@@ -4,6 +4,10 @@ from utils import *
 # file to load data from
 user_data_file = "/Users/vedantpuri/Downloads/users.json"
 users_dump_file = "loaded_users.pickle"
+# store converted by src/ddo_store.py, memory-mapped instead of the json if present
+store_dir = "/Users/vedantpuri/Downloads/ddo_store"
+# fields of users.json used below
+user_fields = ["gender", "birthday", "political_ideology", "religious_ideology"]
 stats_dump_file = "stats.pickle"
 analyze_dump_file = "user_analysis.pickle"
 
@@ -23,7 +27,10 @@ user_map = stat_maps["user_map"]
 relevant_users = 0
 # print_map(user_map)
 if not os.path.isfile(analyze_dump_file):
-    data = load_data(user_data_file, users_dump_file)
+    if os.path.isdir(store_dir):
+        data = load_store(store_dir).users(user_fields)
+    else:
+        data = load_data(user_data_file, users_dump_file, user_fields)
     for user_name in data:
         if user_name in user_map:
             user = data[user_name]
@@ -36,9 +43,11 @@ if not os.path.isfile(analyze_dump_file):
             # num_votes = user["num_of_voted_debates"]
             # num_arguments = user["num_of_opinion_arguments"]
             decisiveness = ""
-            if user_data["unchanged"]+user_data["changed"] > 1:
+            if user_data["unchanged"] + user_data["changed"] > 1:
                 relevant_users += 1
-                frac_changed = user_data["changed"]/(user_data["unchanged"]+user_data["changed"])
+                frac_changed = user_data["changed"] / (
+                    user_data["unchanged"] + user_data["changed"]
+                )
                 # If user changes his mind more than 60% (threshold) of the times
                 if frac_changed > threshold:
                     decisiveness = "fickle"
@@ -52,9 +61,18 @@ if not os.path.isfile(analyze_dump_file):
                 if gender not in ["Male", "Female", "Prefer not to say"]:
                     gender = "Other"
 
-                if len(religious_ideology.split()) > 1 and religious_ideology != "Not Saying":
+                if (
+                    len(religious_ideology.split()) > 1
+                    and religious_ideology != "Not Saying"
+                ):
                     religious_ideology = religious_ideology.split()[0]
-                if religious_ideology not in ["Christian", "Agnostic", "Buddhist", "Atheist", "Not Saying"]:
+                if religious_ideology not in [
+                    "Christian",
+                    "Agnostic",
+                    "Buddhist",
+                    "Atheist",
+                    "Not Saying",
+                ]:
                     religious_ideology = "Other"
 
                 if gender not in statistics["gender"]:
@@ -71,16 +89,13 @@ if not os.path.isfile(analyze_dump_file):
                     if age < 100:
                         age_group = age // 10
                         if age_group not in statistics["age"]:
-                            statistics["age"][age_group] = {"fickle": 0, "rigid":0}
+                            statistics["age"][age_group] = {"fickle": 0, "rigid": 0}
                         statistics["age"][age_group][decisiveness] += 1
 
                 statistics["gender"][gender][decisiveness] += 1
                 statistics["pol"][political_ideology][decisiveness] += 1
                 statistics["rel"][religious_ideology][decisiveness] += 1
-    pickle_dict = {
-                "statistics": statistics,
-                "relevant_users": relevant_users
-    }
+    pickle_dict = {"statistics": statistics, "relevant_users": relevant_users}
     pickle_out = open(analyze_dump_file, "wb")
     pickle.dump(pickle_dict, pickle_out)
     pickle_out.close()
@@ -91,6 +106,7 @@ else:
     statistics = data["statistics"]
     relevant_users = data["relevant_users"]
 
+
 def calc_proportions(key, statistics):
     decisiveness = ["fickle", "rigid"]
     ret_map = {}
@@ -103,20 +119,23 @@ def calc_proportions(key, statistics):
 
     return ret_map
 
-DIVIDER = "="*50
+
+DIVIDER = "=" * 50
 
 age_map = {}
 total_age_available = 0
 for k in statistics["age"]:
-    total_age_available += statistics["age"][k]["fickle"] + statistics["age"][k]["rigid"]
-    group = str(k*10) + "-" + str(k*10 + 9)
+    total_age_available += (
+        statistics["age"][k]["fickle"] + statistics["age"][k]["rigid"]
+    )
+    group = str(k * 10) + "-" + str(k * 10 + 9)
     age_map[group] = statistics["age"][k]
 
 print(DIVIDER + "\nAge wise statistics\n" + DIVIDER)
 print_map(age_map)
 print(f"Total users for which age available: {total_age_available}\n")
 
-print(DIVIDER + "\nGender-wise statistics\n"  + DIVIDER)
+print(DIVIDER + "\nGender-wise statistics\n" + DIVIDER)
 gender_props = calc_proportions("gender", statistics)
 print_map_rec(gender_props)
 
@@ -133,15 +152,21 @@ print(DIVIDER + f"\nNumber of relevant users: {relevant_users}\n" + DIVIDER)
 # print_map(statistics)
 
 # gender
-group_plot(prepare_for_plot(gender_props), ['firmness', 'Gender', 'val'], 'gender_firmness.png')
+group_plot(
+    prepare_for_plot(gender_props), ["firmness", "Gender", "val"], "gender_firmness.png"
+)
 aggregate_and_plot(statistics, "gender")
 
 # Political
-group_plot(prepare_for_plot(pol_props), ['firmness', 'Pol Ideology', 'val'], 'pol_firmness.png')
+group_plot(
+    prepare_for_plot(pol_props), ["firmness", "Pol Ideology", "val"], "pol_firmness.png"
+)
 aggregate_and_plot(statistics, "pol", "Labor")
 
 # Religious
-group_plot(prepare_for_plot(rel_props), ['firmness', 'Rel Ideology', 'val'], 'rel_firmness.png')
+group_plot(
+    prepare_for_plot(rel_props), ["firmness", "Rel Ideology", "val"], "rel_firmness.png"
+)
 aggregate_and_plot(statistics, "rel")
 
 
@@ -155,9 +180,10 @@ pie_plot(labels, fickle_vals, "age_fickle.png")
 pie_plot(labels, rigid_vals, "age_rigid.png")
 
 
-
 for k in age_map:
     total = age_map[k]["fickle"] + age_map[k]["rigid"]
     age_map[k]["fickle"] /= total
     age_map[k]["rigid"] /= total
-group_plot(prepare_for_plot(age_map), ['firmness', 'Age range', 'val'], 'age_firmness.png')
+group_plot(
+    prepare_for_plot(age_map), ["firmness", "Age range", "val"], "age_firmness.png"
+)
@@ -4,6 +4,16 @@ from utils import *
 # file to load debate data from
 data_file = "/Users/vedantpuri/Downloads/debates.json"
 debates_dump_file = "loaded_debates.pickle"
+# store converted by src/ddo_store.py, memory-mapped instead of the json if present
+store_dir = "/Users/vedantpuri/Downloads/ddo_store"
+# fields of debates.json used below
+debate_fields = [
+    "title",
+    "category",
+    "votes",
+    "participant_1_name",
+    "participant_2_name",
+]
 stats_dump_file = "stats.pickle"
 
 # debate_id -> {c -> , u->}
@@ -16,7 +26,10 @@ user_map = {}
 
 # Main
 if not os.path.isfile(stats_dump_file):
-    data = load_data(data_file, debates_dump_file)
+    if os.path.isdir(store_dir):
+        data = load_store(store_dir).debates(debate_fields)
+    else:
+        data = load_data(data_file, debates_dump_file, debate_fields)
     for topic in data:
         debate = data[topic]
         debate_id = debate["title"]
@@ -73,7 +86,7 @@ print(f"Number of users analyzed {len(user_map)}")
 # Plot category data
 category_data = []
 for k in category_map:
-     category_data.append(["changed", k, category_map[k]["changed"]])
-     category_data.append(["unchanged", k, category_map[k]["unchanged"]])
+    category_data.append(["changed", k, category_map[k]["changed"]])
+    category_data.append(["unchanged", k, category_map[k]["unchanged"]])
 
-group_plot(category_data, ['stance', 'category', 'val'], 'category_stats.png')
+group_plot(category_data, ["stance", "category", "val"], "category_stats.png")
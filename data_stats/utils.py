@@ -1,20 +1,25 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 import os.path
-import json, pickle, os.path
+import json, pickle, os.path, sys
 from matplotlib import rcParams
-rcParams.update({'figure.autolayout': True})
 
+rcParams.update({"figure.autolayout": True})
 
-def load_data(data_path, pickle_path):
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from data_processing import iter_json_object
+from ddo_store import DDOStore
+
+
+def load_data(data_path, pickle_path, fields=None):
     """
-    Load the debates either from scratch or from a pickle dump
+    Load the debates either from scratch or from a pickle dump. The json file is
+    streamed one entry at a time, keeping only the given fields of each entry
     :return: The loaded debates
     """
     if not os.path.isfile(pickle_path):
         print("No pickle dump found. Loading data from scratch ...")
-        with open(data_path) as json_file:
-            data = json.load(json_file)
+        data = dict(iter_json_object(data_path, fields))
         pickle_out = open(pickle_path, "wb")
         pickle.dump(data, pickle_out)
         pickle_out.close()
@@ -28,6 +33,16 @@ def load_data(data_path, pickle_path):
     return data
 
 
+def load_store(store_path):
+    """
+    Open a store converted by src/ddo_store.py. Its arrays are memory-mapped,
+    so this takes milliseconds instead of parsing the json files
+    :return: The DDOStore
+    """
+    print(f"Store found: {store_path} Memory-mapping ...")
+    return DDOStore(store_path)
+
+
 def analyze_vote(vote):
     """
     Analyze the stance of voter before and after
@@ -48,12 +63,14 @@ def print_map(h_map):
     for k in h_map:
         print(f"{k} :   {h_map[k]}")
 
+
 def save_fig(fig_name):
-    if not os.path.isdir('../Figures/'):
-        os.makedirs('../Figures/')
-    plt.savefig('../Figures/' + fig_name)
+    if not os.path.isdir("../Figures/"):
+        os.makedirs("../Figures/")
+    plt.savefig("../Figures/" + fig_name)
     plt.close()
 
+
 def aggregate_and_plot(statistics, inner_key, exclude=None):
     labels = []
     fickle_vals = []
@@ -66,24 +83,28 @@ def aggregate_and_plot(statistics, inner_key, exclude=None):
     pie_plot(labels, fickle_vals, inner_key + "_fickle.png")
     pie_plot(labels, rigid_vals, inner_key + "_rigid.png")
 
+
 def group_plot(data, data_key, fig_name):
     df = pd.DataFrame(data, columns=data_key)
-    df.pivot(data_key[1], data_key[0], data_key[2]).plot(kind='bar', figsize=(15,10))
+    df.pivot(data_key[1], data_key[0], data_key[2]).plot(kind="bar", figsize=(15, 10))
     save_fig(fig_name)
 
+
 def prepare_for_plot(data_map):
     data = []
     for k in data_map:
-         data.append(["fickle", k, data_map[k]["fickle"]])
-         data.append(["rigid", k, data_map[k]["rigid"]])
+        data.append(["fickle", k, data_map[k]["fickle"]])
+        data.append(["rigid", k, data_map[k]["rigid"]])
     return data
 
+
 def pie_plot(labels, values, fig_name):
     plt.pie(values, labels=labels)
     save_fig(fig_name)
 
+
 def print_map_rec(input_map):
     for k in input_map:
-        print("\033[1m" + k +"\033[0m")
+        print("\033[1m" + k + "\033[0m")
         print_map(input_map[k])
         print()
@@ -1,7 +1,7 @@
 #!/bin/bash
 # ablations.sh
 # Author: Vedant Puri
-# Version: 1.1.0
+# Version: 1.2.0
 
 # Console text preferences
 underline="$(tput smul)"
@@ -10,7 +10,7 @@ normal="$(tput sgr0)"
 divider="=============================="
 
 # Script information
-script_version="1.1.0"
+script_version="1.2.0"
 
 # Environment info
 curr_dir="$(pwd)/"
@@ -35,23 +35,17 @@ print_usage() {
   ${underline}-f${normal}        Flush output file if exists"
 }
 
-# Run all configs
+# Run all configs as a single sweep
 run_all() {
   echo -e "Running all configurations\n"
-  for file in "${configs_dir}"/*/*
-  do
-    python main.py "${data_path}" "${output_file}" "${file}"
-  done
+  python main.py "${data_path}" "${output_file}" "${configs_dir}"/*/
 }
 
 
-# Run directory
+# Run directory as a single sweep
 run_dir() {
   echo -e "Running directory routine for ${1#*=}\n"
-  for file in "${configs_dir}/${1#*=}"/*
-  do
-    python main.py "${data_path}" "${output_file}" "${file}"
-  done
+  python main.py "${data_path}" "${output_file}" "${configs_dir}/${1#*=}"
 }
 
 # Run a specific config
@@ -75,10 +69,14 @@ run_jobs() {
   [[ "${jobs}" != *","* ]] && run_specific "${jobs}" && return
 
   # Run a list of comma separated configs [no space before/after comma]
+  configs=()
   for i in $(echo $jobs | sed "s/,/ /g")
   do
-      run_specific "$i"
+      [[ ! -f "${i}" ]] && echo "Specific Config File doesn't exit" && exit
+      configs+=("${i}")
   done
+  echo -e "Running ${jobs}\n"
+  python main.py "${data_path}" "${output_file}" "${configs[@]}"
 }
 
 # Parse script arguments
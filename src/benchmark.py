@@ -0,0 +1,284 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import numpy as np
+import nltk
+import sklearn
+from sklearn.feature_extraction.text import TfidfVectorizer
+import language_features as lf
+from main import LogRegModel, parse_config, run_training
+from user_features import UserTable, get_bigissues, build_bigissues_dict
+from data_processing import parse_debates, filter_category
+from synthetic_data import SyntheticDDO
+
+default_config = os.path.join("configs", "all_features", "all_features.json")
+
+
+class Inputs:
+    """
+    Synthetic inputs of one benchmark size, generated once with a fixed seed
+    so every run measures the same data.
+    """
+
+    def __init__(self, n_debates, seed=0):
+        self.n_debates = n_debates
+        self.users, self.debates = SyntheticDDO(
+            max(200, 4 * n_debates), n_debates, voters_per_debate=15, seed=seed
+        ).dataset()
+        self.user_table = UserTable(self.users)
+        parsed = parse_debates(filter_category(self.debates, None), self.users)
+        self.debate_text = parsed[1]
+        self.texts = [text for debate_text in self.debate_text for text in debate_text]
+        self.tokenized = [nltk.word_tokenize(text) for text in self.texts]
+        voters, debaters = parsed[3], parsed[2]
+        self.voter_names = [voter for names in voters for voter in names]
+        self.debater_names = [
+            pair[0] for pair, names in zip(debaters, voters) for _ in names
+        ]
+
+
+def bench_extract_features(inputs):
+    model = LogRegModel(None)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # A fresh cache, so the text features are computed every time
+        model.cache_path = os.path.join(cache_dir, "cache.sqlite")
+        model.extract_features(inputs.debates, inputs.users, inputs.user_table)
+
+
+def setup_training(inputs):
+    model = LogRegModel(None)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        model.cache_path = os.path.join(cache_dir, "cache.sqlite")
+        X, Y, voters = model.extract_features(
+            inputs.debates, inputs.users, inputs.user_table
+        )
+    X.standardize()
+    config = parse_config(default_config)
+    features = (config["user_features"], config["ling_features"])
+    return model, X, Y, voters, features
+
+
+def bench_run_training(inputs, prepared):
+    model, X, Y, voters, features = prepared
+    run_training(model, X, Y, voters, inputs.user_table, features, "benchmark")
+
+
+def bench_get_bigissues(inputs, issues_dict):
+    for voter, debater in zip(inputs.voter_names, inputs.debater_names):
+        get_bigissues(issues_dict, voter, debater)
+
+
+def bench_pair_features(inputs):
+    voters = inputs.user_table.lookup(inputs.voter_names)
+    debaters = inputs.user_table.lookup(inputs.debater_names)
+    inputs.user_table.pair_features(voters, debaters, debaters)
+
+
+# name -> (function of the inputs timed, optional setup of the inputs whose
+# result is passed to it, function counting the items processed)
+benchmarks = {
+    "tokenize": (
+        lambda inputs: [nltk.word_tokenize(text) for text in inputs.texts],
+        None,
+        lambda inputs: len(inputs.texts),
+    ),
+    "pos_mpqa": (
+        lambda inputs: [lf.subjectivity_counts(tokens) for tokens in inputs.tokenized],
+        None,
+        lambda inputs: len(inputs.texts),
+    ),
+    "vader": (
+        lambda inputs: [lf.get_sentiment(text) for text in inputs.texts],
+        None,
+        lambda inputs: len(inputs.texts),
+    ),
+    "spellcheck": (
+        lambda inputs: [lf.misspellings(tokens) for tokens in inputs.tokenized],
+        None,
+        lambda inputs: len(inputs.texts),
+    ),
+    "lexicons": (
+        lambda inputs: lf.lexicon_counter().transform(inputs.tokenized),
+        None,
+        lambda inputs: len(inputs.texts),
+    ),
+    "arg_lexicons": (
+        lambda inputs: [lf.arg_lexicon_counts(text) for text in inputs.texts],
+        None,
+        lambda inputs: len(inputs.texts),
+    ),
+    "tfidf": (
+        lambda inputs: TfidfVectorizer(
+            ngram_range=(1, 3), max_features=50, stop_words="english"
+        ).fit_transform(inputs.texts),
+        None,
+        lambda inputs: len(inputs.texts),
+    ),
+    "text_to_features": (
+        lambda inputs: lf.texts_to_features(inputs.debate_text),
+        None,
+        lambda inputs: len(inputs.debate_text),
+    ),
+    "get_bigissues": (
+        bench_get_bigissues,
+        lambda inputs: build_bigissues_dict(inputs.users),
+        lambda inputs: len(inputs.voter_names),
+    ),
+    "pair_features": (
+        bench_pair_features,
+        None,
+        lambda inputs: len(inputs.voter_names),
+    ),
+    "extract_features": (
+        bench_extract_features,
+        None,
+        lambda inputs: len(inputs.debate_text),
+    ),
+    "run_training": (
+        bench_run_training,
+        setup_training,
+        lambda inputs: len(inputs.voter_names),
+    ),
+}
+
+
+def time_benchmark(name, inputs, repeat):
+    """
+    Runs one benchmark repeat times on inputs and returns its timings.
+    """
+    func, setup, count = benchmarks[name]
+    with contextlib.redirect_stdout(io.StringIO()):
+        args = (inputs,) if setup is None else (inputs, setup(inputs))
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(*args)
+            times.append(time.perf_counter() - start)
+    items = count(inputs)
+    return {
+        "size": inputs.n_debates,
+        "items": items,
+        "min": min(times),
+        "median": float(np.median(times)),
+        "items_per_second": items / min(times) if min(times) > 0 else None,
+    }
+
+
+def run_benchmarks(names, sizes, repeat, seed=0):
+    """
+    Returns the results of every benchmark in names at every size, keyed by
+    "name/size".
+    """
+    # Keep the one-off loading of lexicons out of the timings
+    lf.load_resources()
+    results = {}
+    for size in sizes:
+        inputs = Inputs(size, seed)
+        for name in names:
+            key = "%s/%d" % (name, size)
+            results[key] = time_benchmark(name, inputs, repeat)
+            print("\t%-24s %10.4f s" % (key, results[key]["min"]))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the ratio of every benchmark's best time to its baseline and returns
+    the keys of those slower than the baseline by more than threshold.
+    """
+    regressions = []
+    print("\n", "=" * 50, "\n\tComparison to baseline\n")
+    for key, result in results.items():
+        if key not in baseline:
+            print("\t%-24s %10s" % (key, "new"))
+            continue
+        ratio = result["min"] / baseline[key]["min"]
+        status = ""
+        if ratio > 1 + threshold:
+            status = "REGRESSION"
+            regressions.append(key)
+        elif ratio < 1 - threshold:
+            status = "faster"
+        print("\t%-24s %9.2fx %s" % (key, ratio, status))
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "nltk": nltk.__version__,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark feature extraction, user features and training."
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="benchmark.json",
+        help="json file the results are written to",
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        help="json results of an earlier run to compare against",
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative slowdown over the baseline reported as a regression",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 50, 200],
+        help="numbers of synthetic debates to benchmark on",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=3,
+        help="number of timed runs of every benchmark, the best one counts",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=sorted(benchmarks),
+        help="benchmarks to run, all by default",
+    )
+    parser.add_argument("-s", "--seed", type=int, default=0, help="input seed")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    print("\n", "=" * 50, "\n\tRunning benchmarks...\n")
+    results = run_benchmarks(
+        args.only or list(benchmarks), args.sizes, args.repeat, args.seed
+    )
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print("\n\tResults written to:", args.output)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\n\t", len(regressions), "regressions over", args.threshold)
+            sys.exit(1)
@@ -1,20 +1,136 @@
 import numpy as np
-import copy
+import json
+
+# Fields of users.json and debates.json read by the pipeline, everything else
+# is dropped when streaming the files
+user_fields = [
+    "gender",
+    "political_ideology",
+    "religious_ideology",
+    "big_issues_dict",
+    "number_of_voted_debates",
+]
+debate_fields = [
+    "category",
+    "participant_1_name",
+    "participant_2_name",
+    "participant_1_position",
+    "rounds",
+    "votes",
+]
+
+
+def iter_json_object(path, fields=None, chunk_size=1 << 20):
+    """
+    Streams the (key, value) pairs of a file holding a single JSON object,
+    decoding one value at a time, so that only one value and a read buffer are
+    held in memory instead of the whole file.
+
+    :param path: path of the JSON file
+    :param fields: if given, values are dicts and only these keys are kept
+    :param chunk_size: number of characters read from the file at a time
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def skip(pos, chars):
+            # Skip whitespace and the given separators, reading more if needed
+            nonlocal buffer, eof
+            while True:
+                while pos < len(buffer) and (
+                    buffer[pos].isspace() or buffer[pos] in chars
+                ):
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return pos
+                buffer, pos = f.read(chunk_size), 0
+                eof = not buffer
+
+        def decode(pos):
+            # Decode the next JSON value, reading more until it is complete. A
+            # number cut by the end of the buffer, e.g. "12" of "12.5e3", also
+            # decodes, so a value is only taken once a character that cannot
+            # continue a number follows it.
+            nonlocal buffer, eof
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    if eof or buffer[end:].lstrip("0123456789.eE+-"):
+                        return value, end
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                buffer = buffer[pos:]
+                pos = 0
+                more = f.read(chunk_size)
+                eof = not more
+                buffer += more
+
+        pos = skip(pos, "")
+        if buffer[pos : pos + 1] != "{":
+            raise ValueError(path + " does not hold a JSON object")
+        pos += 1
+        while True:
+            pos = skip(pos, ",")
+            if eof or buffer[pos] == "}":
+                return
+            key, pos = decode(pos)
+            pos = skip(pos, ":")
+            value, pos = decode(pos)
+            if fields is not None:
+                value = {field: value[field] for field in fields if field in value}
+            yield key, value
+
+
+def load_users(path):
+    """
+    Streams users.json into a dictionary of users holding only user_fields.
+    """
+    return dict(iter_json_object(path, user_fields))
+
+
+def stream_debates(path, users, categories=None, min_votes=10):
+    """
+    Streams debates.json, yielding (name, debate) only for the debates that
+    filter_category and parse_debates would keep: debates of one of the
+    categories (all if None) with more than min_votes votes from known users
+    and known participants. Debates hold only debate_fields, votes only those
+    of known users and rounds only side and text.
+    """
+    for name, debate in iter_json_object(path, debate_fields):
+        if categories is not None and debate["category"] not in categories:
+            continue
+        if (
+            debate["participant_1_name"] not in users
+            or debate["participant_2_name"] not in users
+        ):
+            continue
+        debate["votes"] = [
+            {"user_name": vote["user_name"], "votes_map": vote["votes_map"]}
+            for vote in debate["votes"]
+            if vote["user_name"] in users
+        ]
+        if len(debate["votes"]) <= min_votes:
+            continue
+        debate["rounds"] = [
+            [{"side": side["side"], "text": side["text"]} for side in r]
+            for r in debate["rounds"]
+        ]
+        yield name, debate
 
 
 def filter_category(debates_dict, category):
     """
-    Takes the original dictionary of debates and returns a dictionary of same
-    structure with only debates of desired category.
+    Takes the original dictionary of debates and lazily yields the (name,
+    debate) pairs of the debates of desired category (any if None) that have
+    votes. Debates are not copied, so they must not be modified.
     """
-    if not category:
-        return copy.deepcopy(debates_dict)
-    else:
-        return {
-            k: v
-            for k, v in debates_dict.items()
-            if v["category"] == category and len(v["votes"]) > 0
-        }
+    for k, v in debates_dict.items():
+        if (not category or v["category"] == category) and len(v["votes"]) > 0:
+            yield k, v
 
 
 def changed_mind(vote):
@@ -67,15 +183,17 @@ def votes_to_labels(users, votes):
     return voters, labels
 
 
-def parse_debates(debate_dict, users):
+def parse_debates(debates, users, min_votes=10):
     """
-    Parses the original debate dictionary based on voter_function, which specifies
+    Parses (name, debate) pairs of the original debate dictionary, e.g. the
+    output of filter_category, based on voter_function, which specifies
     which voters to generate examples for (e.g. convinced from the middle).
-    Returns the following lists, with corresponding indices for each debate in debate_dict:
+    Returns the following lists, with corresponding indices for each debate in debates:
     debate_text: list of [concatenated 'pro' texts, concatenated 'con' texts]
     debaters: list of ['pro' debater name, 'con' debater name]
     debate_voters: list of voter name lists (if voter was convinced in this debate)
     debate_winners: list of index of winner lists (0 for 'pro' debater, 1 for 'con')
+    Debates with min_votes or fewer votes from known users are skipped.
     """
     debate_text = []
     debaters = []
@@ -83,7 +201,7 @@ def parse_debates(debate_dict, users):
     debate_labels = []
     debate_keys = []
 
-    for name, debate in debate_dict.items():
+    for name, debate in debates:
         voters, labels = votes_to_labels(users, debate["votes"])
 
         if debate["participant_1_position"] == "Pro":
@@ -94,7 +212,7 @@ def parse_debates(debate_dict, users):
             con_debater = debate["participant_1_name"]
 
         if (
-            len(voters) > 10
+            len(voters) > min_votes
             and pro_debater in users.keys()
             and con_debater in users.keys()
         ):
@@ -114,3 +232,28 @@ def parse_debates(debate_dict, users):
             debate_labels.append(labels)
 
     return debate_keys, debate_text, debaters, debate_voters, debate_labels
+
+
+def debate_columns(debates, users, user_ids, min_votes=10):
+    """
+    Parses (name, debate) pairs like parse_debates and returns the debates it
+    keeps as columns, the same as DDOStore.debate_columns returns:
+    (debate_keys, debate_text, debater_ids, vote_counts, voter_ids, labels).
+
+    :param user_ids: dictionary mapping user names to ids, e.g. UserTable.ids
+    """
+    debate_keys, debate_text, debaters, debate_voters, labels = parse_debates(
+        debates, users, min_votes
+    )
+    debater_ids = np.array(
+        [[user_ids[pro], user_ids[con]] for pro, con in debaters], dtype=np.int64
+    ).reshape(-1, 2)
+    vote_counts = np.array([len(voters) for voters in debate_voters], dtype=np.int64)
+    voter_ids = np.array(
+        [user_ids[voter] for voters in debate_voters for voter in voters],
+        dtype=np.int64,
+    )
+    labels = np.array(
+        [label for sublist in labels for label in sublist], dtype=np.int64
+    )
+    return debate_keys, debate_text, debater_ids, vote_counts, voter_ids, labels
@@ -0,0 +1,479 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from user_features import UserTable, build_bigissues_dict
+from data_processing import iter_json_object, user_fields, debate_fields
+
+store_folder = "ddo_store"
+store_version = 1
+
+# Categorical user fields, stored as codes into the sorted list of their values
+user_categories = ["gender", "political_ideology", "religious_ideology", "birthday"]
+
+# Bits of the flags stored for every (vote, debater) entry of a votes_map
+before_key = "Agreed with before the debate"
+after_key = "Agreed with after the debate"
+has_before, agreed_before, has_after, agreed_after = 1, 2, 4, 8
+
+
+def choice_flags(choice):
+    """
+    Encodes the agreement before and after the debate of one votes_map entry.
+    """
+    flags = 0
+    if before_key in choice:
+        flags |= has_before | (agreed_before if choice[before_key] else 0)
+    if after_key in choice:
+        flags |= has_after | (agreed_after if choice[after_key] else 0)
+    return flags
+
+
+def choice_dict(flags):
+    """
+    Decodes choice_flags back into a votes_map entry.
+    """
+    choice = {}
+    if flags & has_before:
+        choice[before_key] = bool(flags & agreed_before)
+    if flags & has_after:
+        choice[after_key] = bool(flags & agreed_after)
+    return choice
+
+
+def offsets(counts):
+    """
+    Returns the int64 offsets of consecutive runs of the given lengths.
+    """
+    return np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+
+
+def convert(data_path, store_path=None):
+    """
+    Converts users.json and debates.json of data_path into a store at
+    store_path, data_path/ddo_store by default. Both files are streamed, so
+    the conversion never holds the parsed JSON in memory.
+
+    User and debate names are interned to integer ids, every column is saved as
+    a .npy array and the debate texts and titles are written to single blobs
+    indexed by offsets:
+        - users: categorical fields as codes, number of voted debates and the
+          build_bigissues_dict vectors
+        - debates: category code, participant ids, whether participant 1 is
+          'pro', the concatenated 'pro' and 'con' texts and the title
+        - votes: voter id per vote and, per votes_map entry, the id of its key
+          and its agreement flags
+    Names of users that are missing from users.json get ids after all users.
+    """
+    store_path = store_path or os.path.join(data_path, store_folder)
+    os.makedirs(store_path, exist_ok=True)
+    meta_path = os.path.join(store_path, "meta.json")
+    if os.path.isfile(meta_path):
+        os.remove(meta_path)
+    names = []
+    ids = {}
+
+    def intern(name):
+        if name not in ids:
+            ids[name] = len(names)
+            names.append(name)
+        return ids[name]
+
+    # USERS
+    meta = {"version": store_version}
+    arrays = {}
+    categories = {field: [] for field in user_categories}
+    voted_debates = []
+    issues = []
+    users_file = os.path.join(data_path, "users.json")
+    for name, user in iter_json_object(users_file, user_fields + ["birthday"]):
+        intern(name)
+        for field in user_categories:
+            categories[field].append(user[field])
+        voted_debates.append(int(user["number_of_voted_debates"]))
+        issues.append(build_bigissues_dict({name: user})[name])
+    meta["n_users"] = len(names)
+    for field in user_categories:
+        values, codes = np.unique(categories[field], return_inverse=True)
+        meta[field + "_values"] = values.tolist()
+        arrays["user_" + field] = codes.astype(np.int32)
+    arrays["user_voted_debates"] = np.array(voted_debates, dtype=np.int64)
+    arrays["user_issues"] = np.array(issues, dtype=np.int8).reshape(-1, 48, 4)
+
+    # DEBATES
+    debate_names = []
+    debate_categories = []
+    participants = []
+    pro_first = []
+    text_lengths = []
+    title_lengths = []
+    vote_counts = []
+    vote_users = []
+    choice_counts = []
+    choice_keys = []
+    flags = []
+    debates_file = os.path.join(data_path, "debates.json")
+    with open(os.path.join(store_path, "text.bin"), "wb") as text_file, open(
+        os.path.join(store_path, "title.bin"), "wb"
+    ) as title_file:
+        for name, debate in iter_json_object(debates_file, debate_fields + ["title"]):
+            debate_names.append(name)
+            debate_categories.append(debate["category"])
+            participants.append(
+                (
+                    intern(debate["participant_1_name"]),
+                    intern(debate["participant_2_name"]),
+                )
+            )
+            pro_first.append(debate["participant_1_position"] == "Pro")
+            pro_text = ""
+            con_text = ""
+            for r in debate["rounds"]:
+                for side in r:
+                    if side["side"] == "Pro":
+                        pro_text += side["text"]
+                    else:
+                        con_text += side["text"]
+            for text in (pro_text, con_text):
+                encoded = text.encode("utf8")
+                text_file.write(encoded)
+                text_lengths.append(len(encoded))
+            encoded = debate.get("title", "").encode("utf8")
+            title_file.write(encoded)
+            title_lengths.append(len(encoded))
+            vote_counts.append(len(debate["votes"]))
+            for vote in debate["votes"]:
+                vote_users.append(intern(vote["user_name"]))
+                choice_counts.append(len(vote["votes_map"]))
+                for key, choice in vote["votes_map"].items():
+                    choice_keys.append(intern(key))
+                    flags.append(choice_flags(choice))
+    meta["names"] = names
+    meta["debate_names"] = debate_names
+    category_values, category_codes = np.unique(debate_categories, return_inverse=True)
+    meta["category_values"] = category_values.tolist()
+    arrays["debate_category"] = category_codes.astype(np.int32)
+    arrays["debate_participants"] = np.array(participants, dtype=np.int32).reshape(
+        -1, 2
+    )
+    arrays["debate_pro_first"] = np.array(pro_first, dtype=bool)
+    arrays["text_offsets"] = offsets(text_lengths)
+    arrays["title_offsets"] = offsets(title_lengths)
+    arrays["vote_offsets"] = offsets(vote_counts)
+    arrays["vote_user"] = np.array(vote_users, dtype=np.int32)
+    arrays["choice_offsets"] = offsets(choice_counts)
+    arrays["choice_key"] = np.array(choice_keys, dtype=np.int32)
+    arrays["choice_flags"] = np.array(flags, dtype=np.uint8)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(store_path, name + ".npy"), array)
+    # Written last, so an interrupted conversion is never mistaken for a store
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    print("\t", len(debate_names), "debates and", meta["n_users"], "users converted")
+    return store_path
+
+
+def map_blob(path):
+    """
+    Memory-maps a binary file as a uint8 array.
+    """
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+class DDOStore:
+    """
+    Read-only view of a dataset converted by convert. Every array is
+    memory-mapped, so opening a store only parses its metadata file (the name tables) and
+    only the pages of the rows that are accessed are ever loaded.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != store_version:
+            raise ValueError(path + " was created by another version, convert again")
+        self.path = path
+        self.names = self.meta["names"]
+        self.n_users = self.meta["n_users"]
+        self.debate_names = self.meta["debate_names"]
+        self.arrays = {}
+        for fname in os.listdir(path):
+            if fname.endswith(".npy"):
+                self.arrays[fname[:-4]] = np.load(
+                    os.path.join(path, fname), mmap_mode="r"
+                )
+        self.text_blob = map_blob(os.path.join(path, "text.bin"))
+        self.title_blob = map_blob(os.path.join(path, "title.bin"))
+
+    @staticmethod
+    def exists(path):
+        return os.path.isfile(os.path.join(path, "meta.json"))
+
+    def __len__(self):
+        return len(self.debate_names)
+
+    def text(self, debate_idx):
+        """
+        Returns the [pro text, con text] of a debate.
+        """
+        bounds = self.arrays["text_offsets"][2 * debate_idx : 2 * debate_idx + 3]
+        return [
+            bytes(self.text_blob[start:end]).decode("utf8")
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def title(self, debate_idx):
+        start, end = self.arrays["title_offsets"][debate_idx : debate_idx + 2]
+        return bytes(self.title_blob[start:end]).decode("utf8")
+
+    def users(self, fields=None):
+        """
+        Returns the dictionary of users, holding the given fields (by default
+        all of user_categories and number_of_voted_debates). The big issues are
+        only available through user_table.
+        """
+        if fields is None:
+            fields = user_categories + ["number_of_voted_debates"]
+        columns = []
+        for field in fields:
+            if field == "number_of_voted_debates":
+                columns.append(self.arrays["user_voted_debates"].tolist())
+            else:
+                values = self.meta[field + "_values"]
+                codes = self.arrays["user_" + field].tolist()
+                columns.append([values[code] for code in codes])
+        return {
+            name: dict(zip(fields, row))
+            for name, row in zip(self.names[: self.n_users], zip(*columns))
+        }
+
+    def user_table(self):
+        """
+        Returns the UserTable of all users, built from the stored columns.
+        """
+        return UserTable.from_columns(
+            self.names[: self.n_users],
+            np.array(self.meta["political_ideology_values"]),
+            np.asarray(self.arrays["user_political_ideology"]),
+            np.array(self.meta["gender_values"]),
+            np.asarray(self.arrays["user_gender"]),
+            np.asarray(self.arrays["user_voted_debates"]),
+            np.asarray(self.arrays["user_issues"], dtype=float),
+        )
+
+    def select(self, categories=None, min_votes=None):
+        """
+        Returns the indices of the debates of the given categories (all if
+        None). If min_votes is given, only debates that parse_debates would
+        keep are returned: known participants and more than min_votes votes
+        from known users.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        if categories is not None:
+            codes = [
+                idx
+                for idx, value in enumerate(self.meta["category_values"])
+                if value in categories
+            ]
+            keep &= np.isin(self.arrays["debate_category"], codes)
+        if min_votes is not None:
+            vote_offsets = self.arrays["vote_offsets"]
+            vote_debate = np.repeat(np.arange(len(self)), np.diff(vote_offsets))
+            known = np.asarray(self.arrays["vote_user"]) < self.n_users
+            known_votes = np.bincount(vote_debate[known], minlength=len(self))
+            keep &= known_votes > min_votes
+            keep &= (np.asarray(self.arrays["debate_participants"]) < self.n_users).all(
+                axis=1
+            )
+        return np.nonzero(keep)[0]
+
+    def vote_rows(self, debate_ids, known_only=False):
+        """
+        Returns the indices of the votes of the given debates, in debate order,
+        and the number of votes of every debate. If known_only, votes of
+        unknown users are left out.
+        """
+        vote_offsets = np.asarray(self.arrays["vote_offsets"])
+        counts = vote_offsets[debate_ids + 1] - vote_offsets[debate_ids]
+        # Consecutive ranges [start, end) of every debate, concatenated
+        shift = vote_offsets[debate_ids] - offsets(counts)[:-1]
+        vote_idx = np.arange(counts.sum()) + np.repeat(shift, counts)
+        if known_only:
+            known = np.asarray(self.arrays["vote_user"])[vote_idx] < self.n_users
+            debate_of_vote = np.repeat(np.arange(len(debate_ids)), counts)
+            counts = np.bincount(debate_of_vote[known], minlength=len(debate_ids))
+            vote_idx = vote_idx[known]
+        return vote_idx, counts
+
+    def vote_labels(self, vote_idx):
+        """
+        Returns the get_winner label of every vote in vote_idx: 1 if the voter
+        agreed with a debater after the debate but not before.
+        """
+        choice_offsets = np.asarray(self.arrays["choice_offsets"])
+        flags = np.asarray(self.arrays["choice_flags"])
+        winner = flags == (has_before | has_after | agreed_after)
+        choice_vote = np.repeat(
+            np.arange(len(choice_offsets) - 1), np.diff(choice_offsets)
+        )
+        winner_votes = np.bincount(
+            choice_vote[winner], minlength=len(choice_offsets) - 1
+        )
+        return (winner_votes[vote_idx] > 0).astype(np.int64)
+
+    def debate_columns(self, categories=None, min_votes=10):
+        """
+        Returns the debates that parse_debates would keep as columns, computed
+        from the stored arrays without rebuilding the debates dictionary:
+            - debate_keys: debate names
+            - debate_text: DebateTexts of their [pro text, con text], decoded
+              only when accessed
+            - debater_ids: (debates x 2) array of the pro and con debater ids
+            - vote_counts: number of votes of known users of every debate
+            - voter_ids: voter id of every vote, in debate order
+            - labels: get_winner label of every vote
+        User ids are those of user_table.
+        """
+        debate_ids = self.select(categories, min_votes)
+        vote_idx, vote_counts = self.vote_rows(debate_ids, known_only=True)
+        participants = np.asarray(self.arrays["debate_participants"])[debate_ids]
+        pro_first = np.asarray(self.arrays["debate_pro_first"])[debate_ids]
+        debater_ids = np.where(
+            pro_first[:, None], participants, participants[:, ::-1]
+        ).astype(np.int64)
+        voter_ids = np.asarray(self.arrays["vote_user"])[vote_idx].astype(np.int64)
+        return (
+            [self.debate_names[idx] for idx in debate_ids.tolist()],
+            DebateTexts(self, debate_ids),
+            debater_ids,
+            vote_counts,
+            voter_ids,
+            self.vote_labels(vote_idx),
+        )
+
+    def debates(self, fields=None, categories=None, min_votes=None):
+        """
+        Rebuilds the dictionary of the debates returned by select, holding the
+        given fields of debates.json (debate_fields and title by default).
+        Rounds are rebuilt as a single round holding the concatenated 'pro'
+        and 'con' texts. If min_votes is given, votes of unknown users are
+        dropped like stream_debates does.
+        """
+        if fields is None:
+            fields = debate_fields + ["title"]
+        debate_ids = self.select(categories, min_votes)
+        # Gather every column once, indexing memmaps per element is slow
+        names = self.names
+        category_values = self.meta["category_values"]
+        categories = np.asarray(self.arrays["debate_category"])[debate_ids].tolist()
+        participants = np.asarray(self.arrays["debate_participants"])[
+            debate_ids
+        ].tolist()
+        pro_first = np.asarray(self.arrays["debate_pro_first"])[debate_ids].tolist()
+        vote_idx, vote_counts = self.vote_rows(debate_ids, min_votes is not None)
+        vote_users = np.asarray(self.arrays["vote_user"])[vote_idx].tolist()
+        choice_offsets = np.asarray(self.arrays["choice_offsets"])
+        choice_starts = choice_offsets[vote_idx].tolist()
+        choice_ends = choice_offsets[vote_idx + 1].tolist()
+        choice_key = np.asarray(self.arrays["choice_key"])
+        choice_flags = np.asarray(self.arrays["choice_flags"])
+        texts = DebateTexts(self, debate_ids)
+        debates = {}
+        vote_pos = 0
+        for pos, idx in enumerate(debate_ids.tolist()):
+            p1, p2 = participants[pos]
+            debate = {
+                "category": category_values[categories[pos]],
+                "participant_1_name": names[p1],
+                "participant_2_name": names[p2],
+                "participant_1_position": "Pro" if pro_first[pos] else "Con",
+            }
+            if "title" in fields:
+                debate["title"] = self.title(idx)
+            if "rounds" in fields:
+                pro_text, con_text = texts[pos]
+                debate["rounds"] = [
+                    [
+                        {"side": "Pro", "text": pro_text},
+                        {"side": "Con", "text": con_text},
+                    ]
+                ]
+            if "votes" in fields:
+                votes = []
+                for vote in range(vote_pos, vote_pos + vote_counts[pos]):
+                    start, end = choice_starts[vote], choice_ends[vote]
+                    votes_map = {
+                        names[key]: choice_dict(flags)
+                        for key, flags in zip(
+                            choice_key[start:end].tolist(),
+                            choice_flags[start:end].tolist(),
+                        )
+                    }
+                    votes.append(
+                        {"user_name": names[vote_users[vote]], "votes_map": votes_map}
+                    )
+                debate["votes"] = votes
+            vote_pos += vote_counts[pos]
+            debates[self.debate_names[idx]] = {
+                field: debate[field] for field in fields if field in debate
+            }
+        return debates
+
+
+class DebateTexts:
+    """
+    The [pro text, con text] of some debates of a DDOStore, as a read-only
+    list whose texts are only decoded from the text blob when accessed.
+    """
+
+    def __init__(self, store, debate_ids):
+        self.blob = store.text_blob
+        text_offsets = np.asarray(store.arrays["text_offsets"])
+        self.bounds = np.stack(
+            (
+                text_offsets[2 * debate_ids],
+                text_offsets[2 * debate_ids + 1],
+                text_offsets[2 * debate_ids + 2],
+            ),
+            axis=1,
+        ).tolist()
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __getitem__(self, idx):
+        start, middle, end = self.bounds[idx]
+        return [
+            bytes(self.blob[start:middle]).decode("utf8"),
+            bytes(self.blob[middle:end]).decode("utf8"),
+        ]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert the DDO json files into a memory-mapped store."
+    )
+    parser.add_argument(
+        "data_path", help="directory containing users.json and debates.json"
+    )
+    parser.add_argument(
+        "store_path",
+        nargs="?",
+        help="directory the store is written to, data_path/" + store_folder + " by "
+        "default",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    print("\n", "=" * 50, "\n\tConverting Dataset...\n")
+    print("\tStore written to:", convert(args.data_path, args.store_path))
@@ -0,0 +1,229 @@
+import os
+import json
+import numpy as np
+from scipy import sparse
+
+
+class DesignMatrix:
+    """
+    Factorized (voter, debate) design matrix. Features that differ per sample,
+    i.e. the user features of a vote, are stored one row per sample, while the
+    linguistic features are stored once per debate together with the index of
+    every sample's debate. A sample's row is the concatenation of its sample
+    row and the rows of its debate in each debate block.
+
+    Rows are only expanded when they are taken, so memory no longer grows with
+    the number of voters times the number of linguistic features. Debate blocks
+    may be scipy sparse matrices, e.g. TF-IDF features; those stay sparse when
+    scaled and taken.
+    """
+
+    def __init__(self, sample_block, debate_blocks, debate_index):
+        """
+        :param sample_block: (samples x k) array of per-sample features
+        :param debate_blocks: list of (debates x k_i) arrays of debate features
+        :param debate_index: integer array holding the debate of every sample
+        """
+        self.sample_block = sample_block
+        self.debate_blocks = debate_blocks
+        self.debate_index = debate_index
+        # Directory of the feature store the matrix was loaded from, if any
+        self.path = None
+        widths = [sample_block.shape[1]] + [block.shape[1] for block in debate_blocks]
+        self.offsets = np.cumsum([0] + widths)
+
+    @property
+    def shape(self):
+        return (len(self.debate_index), int(self.offsets[-1]))
+
+    def __len__(self):
+        return len(self.debate_index)
+
+    def blocks(self):
+        return [self.sample_block] + self.debate_blocks
+
+    def is_sparse(self):
+        return any(sparse.issparse(block) for block in self.debate_blocks)
+
+    def subset(self, rows):
+        """
+        Returns the design matrix of the samples in rows, in that order. Debate
+        blocks are shared with this matrix, not copied.
+        """
+        return DesignMatrix(
+            self.sample_block[rows], self.debate_blocks, self.debate_index[rows]
+        )
+
+    def split_columns(self, columns):
+        """
+        Splits an array of column indices of the full matrix into the local
+        column indices of every block.
+        """
+        columns = np.asarray(columns)
+        return [
+            columns[(columns >= start) & (columns < end)] - start
+            for start, end in zip(self.offsets[:-1], self.offsets[1:])
+        ]
+
+    def take(self, rows, columns=None):
+        """
+        Expands the samples in rows into an array, restricted to columns if
+        given. Only the selected rows and columns are materialized. The result
+        is a CSR matrix if any selected block is sparse, a dense array if not.
+        """
+        if columns is None:
+            columns = np.arange(self.shape[1])
+        debate_rows = self.debate_index[rows]
+        expanded = []
+        for idx, (block, local) in enumerate(
+            zip(self.blocks(), self.split_columns(columns))
+        ):
+            if len(local) == 0:
+                continue
+            block_rows = rows if idx == 0 else debate_rows
+            if sparse.issparse(block):
+                expanded.append(block[block_rows][:, local])
+            else:
+                expanded.append(block[np.ix_(block_rows, local)])
+        if not expanded:
+            return np.empty((len(debate_rows), 0))
+        if any(sparse.issparse(part) for part in expanded):
+            return sparse.hstack(expanded, format="csr")
+        return np.hstack(expanded)
+
+    def column_stats(self):
+        """
+        Returns the mean and variance of every column over all samples. Debate
+        columns are weighted by their debate's number of samples, which gives
+        the statistics of the expanded matrix without expanding it.
+        """
+        n_samples = len(self.debate_index)
+        weights = np.bincount(
+            self.debate_index, minlength=self.debate_blocks[0].shape[0]
+        )
+        means, variances = [], []
+        for idx, block in enumerate(self.blocks()):
+            block_weights = np.ones(n_samples) if idx == 0 else weights
+            if sparse.issparse(block):
+                mean = block.T @ block_weights / n_samples
+                square_mean = block.multiply(block).T @ block_weights / n_samples
+                variance = np.maximum(square_mean - np.square(mean), 0)
+            else:
+                mean = block_weights @ block / n_samples
+                variance = block_weights @ np.square(block - mean) / n_samples
+            means.append(mean)
+            variances.append(variance)
+        return np.concatenate(means), np.concatenate(variances)
+
+    def standardize(self):
+        """
+        Scales every column to zero mean and unit variance in place, the same
+        as StandardScaler does on the expanded matrix, constant columns
+        included. Columns of sparse blocks are only scaled, not centered, like
+        StandardScaler(with_mean=False), so that they stay sparse.
+        """
+        mean, variance = self.column_stats()
+        n_samples = len(self.debate_index)
+        eps = np.finfo(np.float64).eps
+        constant = (
+            variance <= n_samples * eps * variance + (n_samples * mean * eps) ** 2
+        )
+        scale = np.sqrt(variance)
+        scale[constant] = 1.0
+        blocks = []
+        for block, start, end in zip(
+            self.blocks(), self.offsets[:-1], self.offsets[1:]
+        ):
+            if sparse.issparse(block):
+                blocks.append(sparse.csr_matrix(block.multiply(1 / scale[start:end])))
+                mean[start:end] = 0
+            else:
+                blocks.append((block - mean[start:end]) / scale[start:end])
+        self.sample_block, self.debate_blocks = blocks[0], blocks[1:]
+        return mean, scale
+
+    def save(self, path):
+        """
+        Writes the matrix to the directory path, one .npy file per dense block
+        and one .npz file per sparse block, so that load can memory-map it.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "debate_index.npy"), self.debate_index)
+        layout = [
+            save_block(path, idx, block) for idx, block in enumerate(self.blocks())
+        ]
+        with open(os.path.join(path, "layout.json"), "w") as f:
+            json.dump(layout, f)
+
+    @classmethod
+    def write(cls, path, sample_batches, shape, debate_blocks, debate_index):
+        """
+        Writes a matrix to the directory path like save does without holding
+        its sample block in memory, and returns it loaded from path. The sample
+        block is written to a memory-mapped .npy file one batch at a time.
+
+        :param sample_batches: iterable of consecutive row batches of the
+            sample block
+        :param shape: (samples x k) shape of the sample block
+        """
+        os.makedirs(path, exist_ok=True)
+        # An interrupted write must not be mistaken for a matrix
+        layout_path = os.path.join(path, "layout.json")
+        if os.path.isfile(layout_path):
+            os.remove(layout_path)
+        sample_block = np.lib.format.open_memmap(
+            os.path.join(path, "block_0.npy"), mode="w+", dtype=float, shape=shape
+        )
+        start = 0
+        for batch in sample_batches:
+            sample_block[start : start + len(batch)] = batch
+            start += len(batch)
+        sample_block.flush()
+        del sample_block
+        np.save(os.path.join(path, "debate_index.npy"), debate_index)
+        layout = ["dense"] + [
+            save_block(path, idx + 1, block) for idx, block in enumerate(debate_blocks)
+        ]
+        with open(layout_path, "w") as f:
+            json.dump(layout, f)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Loads a matrix written by save. Dense blocks are memory-mapped, so only
+        the rows that are taken are read from disk. Sparse blocks, which only
+        hold one row per debate, are read into memory.
+        """
+        with open(os.path.join(path, "layout.json"), "r") as f:
+            layout = json.load(f)
+        blocks = []
+        for idx, kind in enumerate(layout):
+            if kind == "sparse":
+                blocks.append(
+                    sparse.load_npz(os.path.join(path, "block_%d.npz" % idx)).tocsr()
+                )
+            else:
+                blocks.append(
+                    np.load(
+                        os.path.join(path, "block_%d.npy" % idx), mmap_mode=mmap_mode
+                    )
+                )
+        debate_index = np.load(
+            os.path.join(path, "debate_index.npy"), mmap_mode=mmap_mode
+        )
+        matrix = cls(blocks[0], blocks[1:], debate_index)
+        matrix.path = path
+        return matrix
+
+
+def save_block(path, idx, block):
+    """
+    Writes block idx of a matrix to the directory path and returns its kind,
+    "sparse" or "dense".
+    """
+    if sparse.issparse(block):
+        sparse.save_npz(os.path.join(path, "block_%d.npz" % idx), block)
+        return "sparse"
+    np.save(os.path.join(path, "block_%d.npy" % idx), block)
+    return "dense"
@@ -0,0 +1,76 @@
+import heapq
+from scheduler import resolve_workers, pool_context
+from profiling import profiler
+from language_features import texts_to_groups
+
+
+def init_worker(profile=False):
+    """
+    Starts the profiler of an extraction worker afresh if profile. The worker
+    loads the lexicons, the VADER analyzer and the SpellChecker on first use,
+    once, and only those its feature groups need.
+    """
+    profiler.enable(profile)
+
+
+def balanced_chunks(items, sizes, chunk_size):
+    """
+    Splits items into chunks of about chunk_size items whose total sizes are
+    about equal, so that every chunk takes about the same time to process even
+    though debate lengths vary wildly. Items are assigned largest first to the
+    currently smallest chunk.
+
+    :param items: list of work items
+    :param sizes: list of item sizes, e.g. text lengths
+    :param chunk_size: average number of items per chunk
+    """
+    n_chunks = max(1, -(-len(items) // chunk_size))
+    chunks = [[] for _ in range(n_chunks)]
+    heap = [(0, idx) for idx in range(n_chunks)]
+    order = sorted(range(len(items)), key=lambda idx: -sizes[idx])
+    for item_idx in order:
+        total, chunk_idx = heapq.heappop(heap)
+        chunks[chunk_idx].append(items[item_idx])
+        heapq.heappush(heap, (total + sizes[item_idx], chunk_idx))
+    return [chunk for chunk in chunks if chunk]
+
+
+def extract_chunk(chunk):
+    """
+    Returns the (key, texts_to_groups) pairs of a chunk, a (groups, items) pair
+    of the names of the feature groups to compute and of (key, text) pairs.
+    """
+    groups, items = chunk
+    keys = [key for key, _ in items]
+    return list(zip(keys, texts_to_groups([text for _, text in items], groups)))
+
+
+def extract_chunk_profiled(chunk):
+    """
+    extract_chunk in a worker process, also returning the profiler stats of the
+    chunk for the parent to merge.
+    """
+    return extract_chunk(chunk), profiler.take()
+
+
+def extract_text_features(chunks, workers=1):
+    """
+    Computes the feature groups of every chunk of (key, debate text) pairs on
+    a pool of worker processes. Yields the list of (key, {group: values}) pairs
+    of each chunk as soon as it is done, in completion order.
+
+    :param chunks: list of (groups, items) pairs of the names of the feature
+        groups to compute and of a chunk of items, see balanced_chunks
+    :param workers: number of worker processes, 0 for one per core
+    """
+    workers = min(resolve_workers(workers), len(chunks))
+    if workers <= 1:
+        for chunk in chunks:
+            yield extract_chunk(chunk)
+        return
+    with pool_context().Pool(
+        workers, initializer=init_worker, initargs=(profiler.enabled,)
+    ) as pool:
+        for computed, stats in pool.imap_unordered(extract_chunk_profiled, chunks):
+            profiler.merge(stats)
+            yield computed
@@ -0,0 +1,103 @@
+import os
+import pickle
+import sqlite3
+import hashlib
+
+src_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Everything the text features are computed from. Editing any of these files
+# changes the fingerprint and thereby invalidates the cached features.
+fingerprint_sources = ["language_features.py"]
+lexicon_folder = "lexicons"
+
+
+def extractor_fingerprint():
+    """
+    Returns a hash of the feature extractor code and the contents of every
+    lexicon file it reads.
+    """
+    paths = [os.path.join(src_dir, source) for source in fingerprint_sources]
+    for root, _, files in os.walk(os.path.join(src_dir, lexicon_folder)):
+        paths.extend(os.path.join(root, fname) for fname in files)
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.relpath(path, src_dir).encode("utf8") + b"\0")
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def text_hash(debate_text):
+    """
+    Returns the content hash of a debate, given as [pro text, con text].
+    """
+    digest = hashlib.sha256()
+    for text in debate_text:
+        encoded = text.encode("utf8")
+        digest.update(str(len(encoded)).encode("utf8") + b"\0" + encoded)
+    return digest.hexdigest()
+
+
+class TextFeatureCache:
+    """
+    Content-addressed store of the linguistic feature groups of debates, see
+    texts_to_groups. Entries are keyed by the hash of a debate's pro/con text,
+    by the feature group and by the extractor fingerprint, so only new or
+    edited debates and newly enabled groups need to be computed and entries
+    computed by an older version of the extractor or lexicons are never reused.
+    """
+
+    def __init__(self, path, fingerprint=None):
+        self.path = path
+        self.fingerprint = fingerprint or extractor_fingerprint()
+        self.connection = sqlite3.connect(path)
+        # Whole feature vectors cached before features were cached per group
+        self.connection.execute("DROP TABLE IF EXISTS text_features")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS group_features ("
+            "text_hash TEXT NOT NULL, feature_group TEXT NOT NULL, "
+            "fingerprint TEXT NOT NULL, features BLOB NOT NULL, "
+            "PRIMARY KEY (text_hash, feature_group, fingerprint))"
+        )
+        # Entries of other extractor versions can never be hit again
+        self.connection.execute(
+            "DELETE FROM group_features WHERE fingerprint != ?", (self.fingerprint,)
+        )
+        self.connection.commit()
+
+    def get_many(self, hashes, group):
+        """
+        Returns a dictionary mapping each hash of hashes whose group is cached
+        to the values of that group.
+        """
+        found = {}
+        hashes = list(set(hashes))
+        # Stay below sqlite's limit on the number of query parameters
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start : start + 500]
+            rows = self.connection.execute(
+                "SELECT text_hash, features FROM group_features WHERE fingerprint = ? "
+                "AND feature_group = ? "
+                "AND text_hash IN (" + ",".join("?" * len(batch)) + ")",
+                [self.fingerprint, group] + batch,
+            )
+            for key, features in rows:
+                found[key] = pickle.loads(features)
+        return found
+
+    def put_many(self, items):
+        """
+        Stores (hash, {group: values}) pairs and commits them.
+        """
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO group_features VALUES (?, ?, ?, ?)",
+            [
+                (key, group, self.fingerprint, pickle.dumps(values))
+                for key, group_values in items
+                for group, values in group_values.items()
+            ],
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
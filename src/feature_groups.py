@@ -0,0 +1,27 @@
+class FeatureGroup:
+    """
+    A group of features that configs switch on or off with [bool, dims]. Holds
+    the group's name in the configs, its number of columns (per debate side
+    for linguistic groups) and the function computing them.
+    """
+
+    def __init__(self, name, dims, compute):
+        self.name = name
+        self.dims = dims
+        self.compute = compute
+
+
+def enabled_groups(registry, feature_dicts):
+    """
+    Returns the names of the groups of registry, in registry order, that are
+    enabled in any of feature_dicts.
+
+    :param registry: dictionary mapping group name to FeatureGroup
+    :param feature_dicts: list of config feature dictionaries, mapping a group
+        name to its (bool, dims) pair
+    """
+    return [
+        name
+        for name in registry
+        if any(features.get(name, (False, 0))[0] for features in feature_dicts)
+    ]
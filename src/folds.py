@@ -0,0 +1,185 @@
+import os
+import hashlib
+import numpy as np
+from scipy import sparse
+from streaming import row_batches, batch_stats, merge_stats, stats_scaler
+
+
+def hash_arrays(digest, arrays):
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype, array.shape)).encode("utf8"))
+        digest.update(array.data)
+
+
+def dataset_fingerprint(X, Y, voters, contents=False):
+    """
+    Returns a hash of what the folds of a prepared dataset depend on: the
+    labels, the voter ids and the shape of the DesignMatrix X, which are cheap
+    to hash. If contents, the scaler statistics of out-of-core folds depend on
+    the values of X too. For a matrix loaded from a feature store its path and
+    the size and modification time of its files are hashed then, otherwise
+    every block of X.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(X.shape).encode("utf8"))
+    hash_arrays(digest, [Y, voters])
+    if contents and X.path is not None:
+        for fname in sorted(os.listdir(X.path)):
+            stat = os.stat(os.path.join(X.path, fname))
+            digest.update(str((X.path, fname, stat.st_size, stat.st_mtime_ns)).encode())
+    elif contents:
+        arrays = [X.debate_index]
+        for block in X.blocks():
+            if sparse.issparse(block):
+                arrays.extend([block.data, block.indices, block.indptr])
+            else:
+                arrays.append(block)
+        hash_arrays(digest, arrays)
+    return digest.hexdigest()
+
+
+def splits_fingerprint(splits):
+    """
+    Returns a hash of a list of (train_idx, test_idx) pairs.
+    """
+    digest = hashlib.sha256()
+    hash_arrays(digest, [idx for split in splits for idx in split])
+    return digest.hexdigest()
+
+
+def insert_column(X, values):
+    """
+    Returns X, dense or sparse, with values inserted as its first column.
+    """
+    if sparse.issparse(X):
+        column = sparse.csr_matrix(np.asarray(values, dtype=float)[:, None])
+        return sparse.hstack((column, X), format="csr")
+    return np.insert(X, 0, values, axis=1)
+
+
+class Fold:
+    """
+    Artifacts of one cross validation fold that are the same for every config:
+    the train and test rows, their labels and their persuadability columns.
+    """
+
+    def __init__(self, train_idx, test_idx, Y, voters, user_table):
+        self.train_idx = train_idx
+        self.test_idx = test_idx
+        self.Y_train = Y[train_idx]
+        self.Y_test = Y[test_idx]
+        self.persuade_train = user_table.persuadability(voters[train_idx])
+        self.persuade_test = user_table.persuadability(voters[test_idx])
+
+
+class StreamFold:
+    """
+    Out-of-core counterpart of Fold. Holds the train and test rows, sorted so
+    that batches read the feature store in order, the persuade_counts of the
+    training and test voters, from which the persuadability of any batch is
+    gathered, and the scaler of every column of the training rows,
+    persuadability first.
+    """
+
+    def __init__(self, train_idx, test_idx, voters, user_table, scaler):
+        self.train_idx = np.sort(train_idx)
+        self.test_idx = np.sort(test_idx)
+        self.train_counts = user_table.persuade_counts(voters[self.train_idx])
+        self.test_counts = user_table.persuade_counts(voters[self.test_idx])
+        self.scaler = scaler
+
+    def loader(self, X, Y, voters, user_table, counts, columns=None, persuade=True):
+        """
+        Returns a function loading the (X, Y) of an array of rows, restricted
+        to columns of X, with the persuadability within counts inserted first
+        if persuade.
+        """
+
+        def load(rows):
+            X_batch = X.take(rows, columns)
+            if persuade:
+                p = user_table.persuadability(voters[rows], counts)
+                X_batch = insert_column(X_batch, p)
+            return X_batch, Y[rows]
+
+        return load
+
+
+def stream_folds(X, Y, voters, user_table, splits, batch_size):
+    """
+    Returns the StreamFold of every (train_idx, test_idx) pair of splits. The
+    scaler statistics of every fold's training rows are gathered in a single
+    pass over X, in batches of batch_size rows: the statistics of the held out
+    rows of every fold are accumulated, and those of a fold's training rows
+    merged from the other folds'. Persuadability depends on the training rows,
+    so its statistics are computed per fold from the voters.
+    """
+    fold_of_row = np.empty(len(Y), dtype=np.int64)
+    for fold_idx, (_, test_idx) in enumerate(splits):
+        fold_of_row[test_idx] = fold_idx
+    test_stats = [None] * len(splits)
+    for rows in row_batches(np.arange(len(Y)), batch_size):
+        X_batch = X.take(rows)
+        for fold_idx in range(len(splits)):
+            fold_rows = np.nonzero(fold_of_row[rows] == fold_idx)[0]
+            if len(fold_rows):
+                test_stats[fold_idx] = merge_stats(
+                    test_stats[fold_idx], batch_stats(X_batch[fold_rows])
+                )
+    folds = []
+    for fold_idx, (train_idx, test_idx) in enumerate(splits):
+        stats = None
+        for other_idx in range(len(splits)):
+            if other_idx != fold_idx:
+                stats = merge_stats(stats, test_stats[other_idx])
+        fold = StreamFold(train_idx, test_idx, voters, user_table, None)
+        persuade = user_table.persuadability(voters[fold.train_idx], fold.train_counts)
+        count, persuade_mean, persuade_m2 = batch_stats(persuade[:, None])
+        fold.scaler = stats_scaler(
+            (
+                count,
+                np.concatenate((persuade_mean, stats[1])),
+                np.concatenate((persuade_m2, stats[2])),
+            ),
+            with_mean=not X.is_sparse(),
+        )
+        folds.append(fold)
+    return folds
+
+
+class FoldCache:
+    """
+    Fold artifacts of the prepared datasets of a sweep, computed once per
+    dataset, splits and batch size and shared by every config evaluated on
+    that dataset.
+    """
+
+    def __init__(self):
+        self.folds = {}
+
+    def get(self, X, Y, voters, user_table, splits, batch_size=None):
+        """
+        Returns the list of folds of a dataset, building them on the first call
+        for its fingerprint, splits and batch_size.
+
+        :param splits: list of (train_idx, test_idx) pairs
+        :param batch_size: number of rows per batch, given for out-of-core
+            StreamFolds
+        """
+        key = (
+            dataset_fingerprint(X, Y, voters, contents=batch_size is not None),
+            splits_fingerprint(splits),
+            batch_size,
+        )
+        if key not in self.folds:
+            if batch_size is None:
+                self.folds[key] = [
+                    Fold(train_idx, test_idx, Y, voters, user_table)
+                    for train_idx, test_idx in splits
+                ]
+            else:
+                self.folds[key] = stream_folds(
+                    X, Y, voters, user_table, splits, batch_size
+                )
+        return self.folds[key]
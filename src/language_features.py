@@ -1,15 +1,32 @@
 import numpy as np
-import nltk
-import re
-from spellchecker import SpellChecker
-import string
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
 import re
+import collections
+import functools
+from scipy import sparse
+from profiling import profiler
+from feature_groups import FeatureGroup
 
 arg_lex_folder = "lexicons/argument_lexicons/"
 
-spell = SpellChecker()
-sentiment = SentimentIntensityAnalyzer()
+# NLTK, the lexicons, the VADER analyzer and the SpellChecker are loaded on
+# first use and then shared by every call in the process, so importing this
+# module is cheap when no text features are computed, e.g. when they are all
+# cached.
+
+
+@functools.lru_cache(maxsize=None)
+def spell_checker():
+    from spellchecker import SpellChecker
+
+    return SpellChecker()
+
+
+@functools.lru_cache(maxsize=None)
+def sentiment_analyzer():
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+    return SentimentIntensityAnalyzer()
+
 
 opponent_words = ["opponent", "contendor", "pro", "con"]
 
@@ -170,11 +187,14 @@ polar_set = set(
 first_person = ["i", "me", "my", "mine"]
 second_person = ["you", "your", "yours"]
 
-positive_words = set(map(lambda x: x.strip(), open(pos_filename).read().splitlines()))
-negative_words = set(map(lambda x: x.strip(), open(neg_filename).read().splitlines()))
-offensive_words = set(
-    map(lambda x: x.strip(), open(offensive_filename).read().splitlines())
-)
+
+@functools.lru_cache(maxsize=None)
+def read_word_list(fname):
+    """
+    Returns the set of words of a lexicon file, one word per line.
+    """
+    with open(fname) as f:
+        return set(map(lambda x: x.strip(), f.read().splitlines()))
 
 
 def read_mpqa_data():
@@ -193,49 +213,78 @@ def read_mpqa_data():
     return lexicon_dic
 
 
-mpqa_lexicon_dic = read_mpqa_data()
+# (priorpolarity, polarity_type) of the four subjectivity features, in the
+# order they are added to the feature vector
+subjectivity_buckets = [
+    ("positive", "strongsubj"),
+    ("positive", "weaksubj"),
+    ("negative", "strongsubj"),
+    ("negative", "weaksubj"),
+]
+
+tag_to_pos = {
+    "NN": "noun",
+    "NNP": "noun",
+    "NNS": "noun",
+    "VB": "verb",
+    "VBD": "verb",
+    "VBG": "verb",
+    "VBN": "verb",
+    "VBP": "verb",
+    "VBZ": "verb",
+    "JJR": "adj",
+    "JJS": "adj",
+    "JJ": "adj",
+}
+
+
+def build_subjectivity_table(lexicon_dic):
+    """
+    Maps every (word, pos) entry of the MPQA lexicon that belongs to one of the
+    subjectivity_buckets to the index of that bucket.
+    """
+    bucket_idx = {bucket: idx for idx, bucket in enumerate(subjectivity_buckets)}
+    table = {}
+    for key, entry in lexicon_dic.items():
+        bucket = (entry["priorpolarity"], entry["type"])
+        if bucket in bucket_idx:
+            table[key] = bucket_idx[bucket]
+    return table
+
+
+@functools.lru_cache(maxsize=None)
+def mpqa_subjectivity_table():
+    return build_subjectivity_table(read_mpqa_data())
+
+
+def subjectivity_counts(text):
+    """
+    Counts the strong/weak positive/negative subjective words of a tokenized
+    text with a single POS-tagging pass. Returns the counts in the order of
+    subjectivity_buckets, each equal to the matching includes_sentiment_words.
+    """
+    import nltk
+
+    counts = [0] * len(subjectivity_buckets)
+    table = mpqa_subjectivity_table()
+    for word, tag in nltk.pos_tag(text):
+        word = word.lower()
+        bucket = table.get((word, tag_to_pos.get(tag, "none")))
+        if bucket is not None:
+            counts[bucket] += 1
+        bucket = table.get((word, "anypos"))
+        if bucket is not None:
+            counts[bucket] += 1
+    return counts
 
 
 def includes_sentiment_words(
     text, priorpolarity="positive", polarity_type="strongsubj"
 ):
-    count = 0
-    token_list = nltk.pos_tag(text)
-    for tok in token_list:
-
-        pos = "none"
-        if tok[1] == "NN" or tok[1] == "NNP" or tok[1] == "NNS":
-            pos = "noun"
-        if (
-            tok[1] == "VB"
-            or tok[1] == "VBD"
-            or tok[1] == "VBG"
-            or tok[1] == "VBN"
-            or tok[1] == "VBP"
-            or tok[1] == "VBZ"
-        ):
-            pos = "verb"
-        if tok[1] == "JJR" or tok[1] == "JJS" or tok[1] == "JJ":
-            pos = "adj"
-
-        if (tok[0].lower(), pos) in mpqa_lexicon_dic:
-            if (
-                mpqa_lexicon_dic[(tok[0].lower(), pos)]["type"] == polarity_type
-                and mpqa_lexicon_dic[(tok[0].lower(), pos)]["priorpolarity"]
-                == priorpolarity
-            ):
-                count += 1
-        if (tok[0].lower(), "anypos") in mpqa_lexicon_dic:
-            if (
-                mpqa_lexicon_dic[(tok[0].lower(), "anypos")]["type"] == polarity_type
-                and mpqa_lexicon_dic[(tok[0].lower(), "anypos")]["priorpolarity"]
-                == priorpolarity
-            ):
-                count += 1
-    if count > 0:
-        return count
-    else:
+    bucket = (priorpolarity, polarity_type)
+    if bucket not in subjectivity_buckets:
         return 0
+    return subjectivity_counts(text)[subjectivity_buckets.index(bucket)]
 
 
 def get_modals(text):
@@ -354,6 +403,113 @@ def person_count(text):
     return [first_count, second_count, third_count]
 
 
+class LexiconCounter:
+    """
+    Counts how many words of a tokenized text are in each of several lexicons.
+    Like get_lexicon_features, each lowercased token is looked up on its own,
+    so phrase entries such as the hedge "in my opinion" never match, and the
+    evidence phrase "according to" is counted once, by "according".
+
+    A batch of texts is turned into one sparse (texts x terms) count matrix,
+    which is multiplied with a (terms x lexicons) indicator matrix to get the
+    counts of all lexicons at once.
+    """
+
+    def __init__(self, lexicons):
+        self.vocabulary = {}
+        rows, cols = [], []
+        for lexicon_idx, lexicon in enumerate(lexicons):
+            for term in sorted(set(lexicon)):
+                term_idx = self.vocabulary.setdefault(term, len(self.vocabulary))
+                rows.append(term_idx)
+                cols.append(lexicon_idx)
+        self.indicator = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+            shape=(len(self.vocabulary), len(lexicons)),
+        )
+
+    def count_matrix(self, token_lists):
+        """
+        Returns the sparse (texts x terms) matrix of term occurrences.
+        """
+        rows, cols = [], []
+        for text_idx, tokens in enumerate(token_lists):
+            for token in tokens:
+                term_idx = self.vocabulary.get(token.lower())
+                if term_idx is not None:
+                    rows.append(text_idx)
+                    cols.append(term_idx)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+            shape=(len(token_lists), len(self.vocabulary)),
+        )
+
+    def transform(self, token_lists):
+        """
+        Returns the dense (texts x lexicons) array of lexicon word counts.
+        """
+        return (self.count_matrix(token_lists) @ self.indicator).toarray()
+
+
+pronoun_lexicons = [
+    ["i", "us", "my", "mine", "we", "our", "myself", "ourselves", "me"],
+    ["you", "yours", "your", "yourself", "yourselves"],
+    [
+        "he",
+        "she",
+        "his",
+        "her",
+        "hers",
+        "they",
+        "them",
+        "him",
+        "himself",
+        "herself",
+        "themselves",
+    ],
+]
+
+modal_verbs = [
+    "could",
+    "can",
+    "would",
+    "shall",
+    "should",
+    "will",
+    "must",
+    "may",
+    "might",
+]
+
+
+@functools.lru_cache(maxsize=None)
+def lexicon_counter():
+    """
+    Returns the LexiconCounter of the lexicon feature groups, see
+    lexicon_slices.
+    """
+    return LexiconCounter(
+        [opponent_words, hedges, evidence_list, read_word_list(offensive_filename)]
+        + [read_word_list(pos_filename), read_word_list(neg_filename)]
+        + pronoun_lexicons
+        + [[modal] for modal in modal_verbs]
+        + [["!"]]
+    )
+
+
+# Slice of the lexicon_counter output holding the counts of each feature group
+lexicon_slices = {
+    "ref_opp": slice(0, 1),
+    "politeness": slice(1, 2),
+    "evidence": slice(2, 3),
+    "swear": slice(3, 4),
+    "connotation": slice(4, 6),
+    "pronouns": slice(6, 9),
+    "modals": slice(9, 18),
+    "excl_marks": slice(18, 19),
+}
+
+
 def get_length(text):
     return len(text)
 
@@ -372,14 +528,14 @@ def number_count(text):
 
 
 def get_sentiment(text_untokenized):
-    score = sentiment.polarity_scores(text_untokenized)
+    score = sentiment_analyzer().polarity_scores(text_untokenized)
     return score["pos"], score["neu"], score["neg"]
 
 
 def misspellings(text):
     r = re.compile("^((?![.,'\"!?\\-:\[\]]).)*$")
     text = list(filter(r.match, text))
-    misspelled = spell.unknown(text)
+    misspelled = spell_checker().unknown(text)
     return len(misspelled)
 
 
@@ -388,6 +544,7 @@ def get_urls(text):
     return len(urls)
 
 
+@functools.lru_cache(maxsize=None)
 def read_macros():
     macros = []
     macro_files = [
@@ -432,91 +589,283 @@ def read_arg_regex(fname, macros):
     return cont_list
 
 
-macros = read_macros()
+# Argument lexicons in the order they are added to the feature vector
+arg_lexicon_names = [
+    "assessments",
+    "doubt",
+    "authority",
+    "emphasis",
+    "necessity",
+    "causation",
+    "generalization",
+    "structure",
+    "conditionals",
+    "inconsistency",
+    "possibility",
+    "wants",
+    "contrast",
+    "priority",
+    "difficulty",
+    "inyourshoes",
+    "rhetoricalquestion",
+]
+
+
+def required_literal(regex):
+    """
+    Returns the longest run of literal characters that every match of regex
+    contains, or "" if there is none. Only characters outside of groups and
+    character sets that are not made optional by a quantifier are considered,
+    and a top level alternation means that nothing is required.
+    """
+    runs = [""]
+    depth = 0
+    idx = 0
+    while idx < len(regex):
+        char = regex[idx]
+        literal = None
+        if char == "\\" and idx + 1 < len(regex):
+            idx += 1
+            if not regex[idx].isalnum():
+                literal = regex[idx]
+        elif char == "[":
+            # skip the character set, a leading "]" belongs to the set
+            idx = regex.find(
+                "]", idx + 2 if regex[idx + 1 : idx + 2] == "]" else idx + 1
+            )
+            if idx == -1:
+                return ""
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return ""
+        elif char in "?*{":
+            # the preceding character may be absent from a match
+            runs[-1] = runs[-1][:-1]
+            if char == "{":
+                idx = regex.find("}", idx)
+                if idx == -1:
+                    return ""
+        elif char not in ".^$+":
+            literal = char
+        if literal is not None and depth == 0:
+            runs[-1] += literal
+        else:
+            # "+" keeps its character but repeats it, so the run ends there
+            runs.append("")
+        idx += 1
+    return max(runs, key=len)
+
+
+def compile_arg_lexicon(fname, macros):
+    """
+    Reads and compiles the macro-expanded patterns of an argument lexicon once.
+    Returns a list of (compiled pattern, literal every match contains, number
+    of times the pattern occurs in the lexicon). The literal is a cheap
+    substring test that lets most patterns skip the regex search entirely.
+    """
+    patterns = collections.Counter(read_arg_regex(fname, macros))
+    return [
+        (re.compile(regex), required_literal(regex), count)
+        for regex, count in patterns.items()
+    ]
+
+
+# Compiled argument lexicons by file name, each compiled on first use
+arg_lexicons = {}
 
 
 def arg_lexicon_check(string, lexicon_name):
-    cont_list = read_arg_regex(lexicon_name, macros)
+    """
+    Counts the patterns of an argument lexicon that occur in string, with the
+    same per-pattern search semantics as checking every pattern on its own.
+    """
+    if lexicon_name not in arg_lexicons:
+        arg_lexicons[lexicon_name] = compile_arg_lexicon(lexicon_name, read_macros())
     count = 0
-    for regex in cont_list:
-        regexp = re.compile(regex)
-        if bool(regexp.search(string)):
-            count += 1
+    for regexp, literal, occurrences in arg_lexicons[lexicon_name]:
+        if literal in string and regexp.search(string):
+            count += occurrences
     return count
 
 
+def arg_lexicon_counts(string):
+    """
+    Returns the arg_lexicon_check count of every lexicon in arg_lexicon_names.
+    """
+    return [
+        arg_lexicon_check(string, arg_lex_folder + name + ".tff")
+        for name in arg_lexicon_names
+    ]
+
+
+def load_resources():
+    """
+    Loads every lexicon, the VADER analyzer and the SpellChecker now instead of
+    on first use, e.g. so that they are not part of a timed run.
+    """
+    spell_checker()
+    sentiment_analyzer()
+    mpqa_subjectivity_table()
+    lexicon_counter()
+    for name in arg_lexicon_names:
+        arg_lexicon_check("", arg_lex_folder + name + ".tff")
+
+
+class TextBatch:
+    """
+    The texts of a batch of debates, 'pro' and 'con' text of each in turn.
+    Their tokens and lexicon_counter counts are computed on first use and
+    shared by every feature group that needs them.
+    """
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.tokens = None
+        self.counts = None
+
+    def tokenized(self):
+        if self.tokens is None:
+            import nltk
+
+            with profiler.stage("tokenize", rows=len(self.texts)) as timer:
+                self.tokens = [nltk.word_tokenize(text) for text in self.texts]
+                timer.tokens = self.n_tokens()
+        return self.tokens
+
+    def n_tokens(self):
+        """
+        Returns the number of tokens of the batch, 0 if not tokenized yet.
+        """
+        if self.tokens is None:
+            return 0
+        return sum(len(tokens) for tokens in self.tokens)
+
+    def lexicon_counts(self):
+        if self.counts is None:
+            tokens = self.tokenized()
+            with profiler.stage(
+                "lexicons", tokens=self.n_tokens(), rows=len(self.texts)
+            ):
+                self.counts = lexicon_counter().transform(tokens)
+        return self.counts
+
+
+def as_row(value):
+    """
+    Returns the output of an extractor, a number or a sequence, as a list.
+    """
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def token_group(extractor):
+    """
+    Returns the compute function of a feature group applying extractor to the
+    tokens of every text of a TextBatch.
+    """
+    return lambda batch: [as_row(extractor(tokens)) for tokens in batch.tokenized()]
+
+
+def text_group(extractor):
+    """
+    Returns the compute function of a feature group applying extractor to the
+    untokenized text of every text of a TextBatch.
+    """
+    return lambda batch: [as_row(extractor(text)) for text in batch.texts]
+
+
+def lexicon_group(name):
+    """
+    Returns the compute function of a feature group holding the lexicon_counter
+    counts of lexicon_slices[name].
+    """
+    return lambda batch: batch.lexicon_counts()[:, lexicon_slices[name]].tolist()
+
+
+# Linguistic feature groups, in the column order of the configs' ling_features.
+# The tfidf group is fitted over the whole corpus by main.py instead.
+ling_feature_groups = {
+    group.name: group
+    for group in [
+        FeatureGroup("length", 1, token_group(get_length)),
+        FeatureGroup("ref_opp", 1, lexicon_group("ref_opp")),
+        FeatureGroup("politeness", 1, lexicon_group("politeness")),
+        FeatureGroup("evidence", 1, lexicon_group("evidence")),
+        FeatureGroup("sentiment", 3, text_group(get_sentiment)),
+        FeatureGroup("subjectivity", 4, token_group(subjectivity_counts)),
+        FeatureGroup("swear", 1, lexicon_group("swear")),
+        FeatureGroup("connotation", 2, lexicon_group("connotation")),
+        FeatureGroup("pronouns", 3, lexicon_group("pronouns")),
+        FeatureGroup("modals", 9, lexicon_group("modals")),
+        FeatureGroup("spelling", 1, token_group(misspellings)),
+        FeatureGroup("numbers", 1, token_group(number_count)),
+        FeatureGroup("excl_marks", 1, lexicon_group("excl_marks")),
+        FeatureGroup("questions", 1, token_group(question_count)),
+        FeatureGroup("type_ratio", 1, token_group(type_token_ratio)),
+        FeatureGroup("links", 1, text_group(get_urls)),
+        FeatureGroup("arg_lex", len(arg_lexicon_names), text_group(arg_lexicon_counts)),
+    ]
+}
+
+
+def texts_to_groups(debate_texts, groups=None):
+    """
+    Computes only the feature groups named in groups, all of
+    ling_feature_groups if None, over a list of debates. Returns one dictionary
+    per debate mapping each group name to its 'pro' values followed by its
+    'con' values.
+    """
+    if groups is None:
+        groups = list(ling_feature_groups)
+    batch = TextBatch([text for debate_text in debate_texts for text in debate_text])
+    values = {}
+    for name in groups:
+        with profiler.stage(name, rows=len(batch.texts)) as timer:
+            values[name] = ling_feature_groups[name].compute(batch)
+            timer.tokens = batch.n_tokens()
+    return [
+        {name: rows[idx] + rows[idx + 1] for name, rows in values.items()}
+        for idx in range(0, len(batch.texts), 2)
+    ]
+
+
+def split_sides(group_values, groups):
+    """
+    Returns the 'pro' and 'con' feature vectors of one debate from its
+    texts_to_groups output, with the groups in the given order.
+    """
+    pro, con = [], []
+    for name in groups:
+        dims = ling_feature_groups[name].dims
+        pro.extend(group_values[name][:dims])
+        con.extend(group_values[name][dims:])
+    return pro, con
+
+
+def texts_to_features(debate_texts, groups=None):
+    """
+    Batched text_to_features over a list of debates, restricted to the feature
+    groups named in groups if given. The lexicon features of all texts come
+    from a single sparse matrix product of lexicon_counter.
+    """
+    if groups is None:
+        groups = list(ling_feature_groups)
+    features = []
+    for group_values in texts_to_groups(debate_texts, groups):
+        # one vector per debate, the 'pro' features followed by the 'con' ones
+        pro, con = split_sides(group_values, groups)
+        features.append(pro + con)
+    return features
+
+
 def text_to_features(debate_text):
     """
     Transforms text into linguistic features, concatenated into one vector.
     Input 'text' is a list of 2 strings, containing the concatenated 'pro' and
     'con' texts, respectively, for all rounds in one debate.
     """
-    features = []
-    for text in debate_text:
-        feature_array = []
-        tokenized_text = nltk.word_tokenize(text)
-        feature_array.append(get_length(tokenized_text))
-        feature_array.append(get_lexicon_features(tokenized_text, opponent_words))
-        feature_array.append(get_lexicon_features(tokenized_text, hedges))
-        feature_array.append(get_lexicon_features(tokenized_text, evidence_list))
-        feature_array.extend(get_sentiment(text))
-        feature_array.append(includes_sentiment_words(tokenized_text))
-        feature_array.append(
-            includes_sentiment_words(
-                tokenized_text, priorpolarity="positive", polarity_type="weaksubj"
-            )
-        )
-        feature_array.append(
-            includes_sentiment_words(
-                tokenized_text, priorpolarity="negative", polarity_type="strongsubj"
-            )
-        )
-        feature_array.append(
-            includes_sentiment_words(
-                tokenized_text, priorpolarity="negative", polarity_type="weaksubj"
-            )
-        )
-        feature_array.append(get_lexicon_features(tokenized_text, offensive_words))
-        feature_array.append(get_lexicon_features(tokenized_text, positive_words))
-        feature_array.append(get_lexicon_features(tokenized_text, negative_words))
-        feature_array.extend(person_count(tokenized_text))
-        feature_array.extend(get_modals(tokenized_text))
-        feature_array.append(misspellings(tokenized_text))
-        feature_array.append(number_count(tokenized_text))
-        feature_array.append(get_lexicon_features(tokenized_text, ["!"]))
-        feature_array.append(question_count(tokenized_text))
-        feature_array.append(type_token_ratio(tokenized_text))
-        feature_array.append(get_urls(text))
-        feature_array.append(
-            arg_lexicon_check(text, arg_lex_folder + "assessments.tff")
-        )
-        feature_array.append(arg_lexicon_check(text, arg_lex_folder + "doubt.tff"))
-        feature_array.append(arg_lexicon_check(text, arg_lex_folder + "authority.tff"))
-        feature_array.append(arg_lexicon_check(text, arg_lex_folder + "emphasis.tff"))
-        feature_array.append(arg_lexicon_check(text, arg_lex_folder + "necessity.tff"))
-        feature_array.append(arg_lexicon_check(text, arg_lex_folder + "causation.tff"))
-        feature_array.append(
-            arg_lexicon_check(text, arg_lex_folder + "generalization.tff")
-        )
-        feature_array.append(arg_lexicon_check(text, arg_lex_folder + "structure.tff"))
-        feature_array.append(
-            arg_lexicon_check(text, arg_lex_folder + "conditionals.tff")
-        )
-        feature_array.append(
-            arg_lexicon_check(text, arg_lex_folder + "inconsistency.tff")
-        )
-        feature_array.append(
-            arg_lexicon_check(text, arg_lex_folder + "possibility.tff")
-        )
-        feature_array.append(arg_lexicon_check(text, arg_lex_folder + "wants.tff"))
-        feature_array.append(arg_lexicon_check(text, arg_lex_folder + "contrast.tff"))
-        feature_array.append(arg_lexicon_check(text, arg_lex_folder + "priority.tff"))
-        feature_array.append(arg_lexicon_check(text, arg_lex_folder + "difficulty.tff"))
-        feature_array.append(
-            arg_lexicon_check(text, arg_lex_folder + "inyourshoes.tff")
-        )
-        feature_array.append(
-            arg_lexicon_check(text, arg_lex_folder + "rhetoricalquestion.tff")
-        )
-        features.extend(feature_array)
-    return features
+    return texts_to_features([debate_text])[0]
@@ -1,35 +1,69 @@
-import sys
 import csv
-import copy
 import json
-import random
-import pickle
+import glob
 import os.path
-import collections
+import argparse
 import numpy as np
 from user_features import *
 from sklearn.utils import shuffle
 from sklearn.model_selection import KFold
 from sklearn.metrics import accuracy_score
-from language_features import text_to_features
-from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
-from data_processing import parse_debates, filter_category
+from design_matrix import DesignMatrix
+from folds import Fold, FoldCache, insert_column
+from streaming import StreamingLogReg, row_batches, select_scaler
+from scheduler import run_jobs, resolve_workers
+from profiling import profiler, stages
+from extraction import balanced_chunks, extract_text_features
+from feature_groups import enabled_groups
+from language_features import ling_feature_groups, split_sides
+from feature_cache import TextFeatureCache, text_hash
+from ddo_store import DDOStore, store_folder
+from data_processing import debate_columns, filter_category
+from data_processing import load_users, stream_debates
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 
-
 class LogRegModel:
-    def __init__(self, category):
+    def __init__(
+        self,
+        category,
+        cache_path="ttf_cache.sqlite",
+        chunk_size=100,
+        workers=1,
+        tfidf_features=50,
+        sparse_tfidf=False,
+    ):
         """
         Creates a Logistic Regression Model instance.
 
         :param category: string or None, specifies the category of debates to
             filter for when processing the data for model input
+        :param cache_path: path of the text feature cache database
+        :param chunk_size: number of debates whose text features are computed
+            between two commits to the cache
+        :param workers: number of processes computing text features
+        :param tfidf_features: maximum number of TF-IDF n-gram features per side
+        :param sparse_tfidf: keep the TF-IDF features in sparse form, scaling
+            them without centering, so thousands of n-grams fit in memory
         """
         # self.model = LogisticRegression(solver="lbfgs", max_iter=1000, class_weight='balanced')
         self.model = LogisticRegression(solver="lbfgs", max_iter=1000)
         self.category = category
+        self.cache_path = cache_path
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.sparse_tfidf = sparse_tfidf
+        self.vectorizer = TfidfVectorizer(
+            ngram_range=(1, 3), max_features=tfidf_features, stop_words="english"
+        )
+        # Number of columns per side of feature groups whose width is only
+        # known after extraction, used instead of the width in the configs
+        self.group_widths = {}
+        # Names of the user and linguistic feature groups extracted into X, in
+        # column order, see extract_features
+        self.user_groups = list(user_feature_groups)
+        self.ling_groups = list(ling_feature_groups) + ["tfidf"]
 
     def __call__(self, X):
         """
@@ -37,16 +71,73 @@ class LogRegModel:
         """
         self.model.predict(X)
 
-    def form_dict(self, debate_keys, text_features):
+    def text_features(self, debate_text, groups):
         """
-        Convert debate key to feature into dict form
+        Returns, for every debate in debate_text, a dictionary mapping each
+        linguistic feature group named in groups to its texts_to_groups values.
+        Only the groups missing from the text feature cache are computed.
+
+        Debates missing the same groups are split into chunks of about
+        chunk_size debates with balanced text lengths, which are computed on a
+        pool of workers and committed to the cache one chunk at a time, so an
+        interrupted extraction resumes from its last committed chunk.
         """
-        ret_map = {}
-        for idx in range(len(debate_keys)):
-            ret_map[debate_keys[idx]] = text_features[idx]
-        return ret_map
-
-    def extract_features(self, all_debates, users, bigissues_dict):
+        cache = TextFeatureCache(self.cache_path)
+        hashes = [text_hash(text) for text in debate_text]
+        cached = {key: {} for key in hashes}
+        for group in groups:
+            for key, values in cache.get_many(hashes, group).items():
+                cached[key][group] = values
+        # Debates to compute, by the tuple of groups they are missing
+        missing = {}
+        for idx, key in enumerate(hashes):
+            groups_missing = tuple(
+                group for group in groups if group not in cached[key]
+            )
+            if groups_missing:
+                # Mark the debate's groups as pending so duplicates are skipped
+                cached[key].update(dict.fromkeys(groups_missing))
+                missing.setdefault(groups_missing, []).append((key, debate_text[idx]))
+        remaining = sum(len(items) for items in missing.values())
+        completed = len(cached) - remaining
+        print(
+            "\t",
+            completed,
+            "debates found in text feature cache,",
+            remaining,
+            "remaining\n",
+        )
+        chunks = []
+        for groups_missing, items in missing.items():
+            sizes = [len(pro) + len(con) for _, (pro, con) in items]
+            for chunk in balanced_chunks(items, sizes, self.chunk_size):
+                chunks.append((groups_missing, chunk))
+        for computed in extract_text_features(chunks, self.workers):
+            cache.put_many(computed)
+            for key, group_values in computed:
+                cached[key].update(group_values)
+            completed += len(computed)
+            remaining -= len(computed)
+            print(
+                "\tCommitted text features of",
+                completed,
+                "debates,",
+                remaining,
+                "remaining",
+            )
+        cache.close()
+        return [cached[key] for key in hashes]
+
+    def extract_features(
+        self,
+        all_debates,
+        users,
+        user_table,
+        feature_dicts=None,
+        sample=None,
+        path=None,
+        batch_size=10000,
+    ):
         """
         From the debates and users dictionaries, processes data into the form
         needed for model input. This includes:
@@ -54,112 +145,162 @@ class LogRegModel:
             - concatenate 'pro' and 'con' rounds text into two separate strings
             - transforms 'pro' and 'con' strings into linguistic features vec
             - generates user-based feature vecs for each voter/debater pair
-            - concatenates all features into X
+              from user_table, a UserTable of users
+            - stores all features in X, a DesignMatrix holding the linguistic
+              features once per debate
             - generates labels into Y: 0 for 'pro' debater win, 1 for 'con'
+            - returns the user_table id of every sample's voter
+
+        all_debates is either the debates dictionary or a DDOStore, whose
+        columns are used directly and whose texts are only decoded if a
+        linguistic group is extracted; users is not used for a DDOStore.
+
+        Only the feature groups enabled in any of feature_dicts, a list of the
+        (user_features, ling_features) of the configs the matrix is extracted
+        for, are computed and stored in X, all of them if None.
+
+        If sample, a function of the labels returning the indices of the
+        samples to keep in order, is given, only the user features of those
+        samples are computed. If path is given, X is written to a feature store
+        at path, its user features batch_size rows at a time, and returned
+        memory-mapped, so the user features are never all held in memory.
         """
-        debates = filter_category(all_debates, self.category)
-        debate_keys, debate_text, debaters, debate_voters, labels = parse_debates(
-            debates, users
-        )
-        text_list = [item for sublist in debate_text for item in sublist]
-        # check if pickle file exists
-        # if does not exist
-        if not os.path.isfile("ttf.pickle"):
-            print("No pickle file found")
-            text_features = []
-            # i = 0
-            for text in debate_text:
-                # i = i + 1
-                # print("processing:",i,"out of",len(debate_text))
-                to_add = text_to_features(text)
-                # print(to_add)
-                # exit()
-                text_features += [to_add]
-            fileObject = open("ttf.pickle", "wb")
-            print("Length of text_features", len(text_features))
-            print("Length of debate_keys", len(debate_keys))
-            text_features_dict = self.form_dict(debate_keys, text_features)
-            pickle.dump(text_features_dict, fileObject)
-            fileObject.close()
-            # save to pickle
+        if feature_dicts is None:
+            self.user_groups = list(user_feature_groups)
+            self.ling_groups = list(ling_feature_groups) + ["tfidf"]
         else:
-            print("\tPickle file found\n")
-            fileObject = open("ttf.pickle", "rb")
-            print("\tLoading pickle file ...\n")
-            ttf = pickle.load(fileObject)
-            text_features = [ttf[k] for k in debate_keys]
-            print("\tPickle file loaded.\n")
-            fileObject.close()
-
-        vectorizer.fit(text_list)
-        tfidf_features = np.array(vectorizer.transform(text_list).toarray())
-        tfidf_features = tfidf_features.reshape((int(tfidf_features.shape[0] / 2), 100))
-
-        X_userbased = []
-        X_linguistic = []
-        Y = []
-        m = 0
-        for debate_idx, voters in enumerate(debate_voters):
-            # print(debate_idx)
-            debater1, debater2 = debaters[debate_idx]
-            for voter in voters:
-                # print(m)
-                m += 1
-                user_features = []
-                user_features.append(get_bigissues(bigissues_dict, voter, debater1))
-                user_features.append(get_bigissues(bigissues_dict, voter, debater2))
-                user_features.append(get_matching(users, voter, debater1, "Politics"))
-                user_features.append(get_matching(users, voter, debater2, "Politics"))
-                user_features.append(get_matching(users, voter, debater1, "Religion"))
-                user_features.append(get_matching(users, voter, debater2, "Religion"))
-                user_features.extend(get_decidedness(bigissues_dict, voter))
-                user_features.extend(get_gender(users, voter, debater1, debater2))
-                X_userbased.append(user_features)
-            t_features = np.concatenate(
-                (text_features[debate_idx], tfidf_features[debate_idx])
+            self.user_groups = enabled_groups(
+                user_feature_groups, [user for user, _ in feature_dicts]
             )
-            X_linguistic.extend([t_features] * len(voters))
-            Y.extend(labels[debate_idx])
-
-        X = np.concatenate((X_userbased, X_linguistic), axis=1)
-        Y = np.array(Y)
-        voters = [item for sublist in debate_voters for item in sublist]
+            self.ling_groups = enabled_groups(
+                dict(ling_feature_groups, tfidf=None),
+                [ling for _, ling in feature_dicts],
+            )
+        text_groups = [name for name in self.ling_groups if name != "tfidf"]
+        if isinstance(all_debates, DDOStore):
+            columns = all_debates.debate_columns(
+                [self.category] if self.category else None
+            )
+        else:
+            columns = debate_columns(
+                filter_category(all_debates, self.category), users, user_table.ids
+            )
+        debate_keys, debate_text, debater_ids, vote_counts, voter_ids, Y = columns
+        # Texts are only read when some linguistic group is extracted
+        text_features = [{} for _ in debate_keys]
+        if text_groups:
+            with profiler.stage("text_features", rows=len(debate_keys)):
+                text_features = self.text_features(debate_text, text_groups)
+
+        tfidf_blocks = [[], []]
+        if "tfidf" in self.ling_groups:
+            text_list = [item for sublist in debate_text for item in sublist]
+            with profiler.stage("tfidf", rows=len(text_list)):
+                self.vectorizer.fit(text_list)
+                tfidf_features = self.vectorizer.transform(text_list).tocsr()
+            self.group_widths["tfidf"] = tfidf_features.shape[1]
+            if not self.sparse_tfidf:
+                tfidf_features = tfidf_features.toarray()
+            tfidf_blocks = [[tfidf_features[0::2]], [tfidf_features[1::2]]]
+
+        # DEBATE FEATURES ARE STORED ONCE PER DEBATE, NOT ONCE PER VOTER
+        # Lay out linguistic columns per side, [pro ling, pro tfidf, con ling,
+        # con tfidf], which is the order filter_features expects
+        sides = [split_sides(values, text_groups) for values in text_features]
+        pro_ling = np.array([pro for pro, _ in sides], dtype=float)
+        con_ling = np.array([con for _, con in sides], dtype=float)
+        pro_ling = pro_ling.reshape(len(sides), -1)
+        con_ling = con_ling.reshape(len(sides), -1)
+        debate_blocks = [pro_ling] + tfidf_blocks[0] + [con_ling] + tfidf_blocks[1]
+        debate_index = np.repeat(np.arange(len(debate_keys)), vote_counts)
+        if sample is not None:
+            rows = sample(Y)
+            debate_index, voter_ids, Y = debate_index[rows], voter_ids[rows], Y[rows]
+        debater1_ids = debater_ids[debate_index, 0]
+        debater2_ids = debater_ids[debate_index, 1]
+
+        # USER FEATURES OF ALL (VOTER, DEBATER) PAIRS AT ONCE
+        with profiler.stage("user_features", rows=len(voter_ids)):
+            if path is None:
+                X_userbased = user_table.pair_features(
+                    voter_ids, debater1_ids, debater2_ids, self.user_groups
+                )
+                X = DesignMatrix(X_userbased, debate_blocks, debate_index)
+            else:
+                batches = (
+                    user_table.pair_features(
+                        voter_ids[rows],
+                        debater1_ids[rows],
+                        debater2_ids[rows],
+                        self.user_groups,
+                    )
+                    for rows in row_batches(np.arange(len(voter_ids)), batch_size)
+                )
+                width = sum(user_feature_groups[name].dims for name in self.user_groups)
+                X = DesignMatrix.write(
+                    path, batches, (len(voter_ids), width), debate_blocks, debate_index
+                )
         print(
             "\tGenerated",
             X.shape[0],
             " samples from ",
-            len(debate_text),
+            len(debate_keys),
             " debates after filtering\n",
             "=" * 50,
         )
-        return X, Y, voters
+        return X, Y, voter_ids
 
-    def filter_features(self, X, feature_dicts):
+    def feature_columns(self, feature_dicts):
         """
-        Filters X, the inputs for model training, to contain only the features
-        specified in feature_dict.
+        Returns the indices of the columns of X, the inputs for model training,
+        that hold the features specified in feature_dict. Columns are laid out
+        in the order of the extracted user_groups and ling_groups.
         """
         feature_bools = []
         user_features, ling_features = feature_dicts
-        for incl_feat, num_vals in user_features.values():
+        for name in self.user_groups:
+            incl_feat = user_features.get(name, (False, 0))[0]
+            num_vals = user_feature_groups[name].dims
             if incl_feat:
                 feature_bools.extend([1] * num_vals)
             else:
                 feature_bools.extend([0] * num_vals)
         for i in range(2):
-            for incl_feat, num_vals in ling_features.values():
+            for name in self.ling_groups:
+                incl_feat = ling_features.get(name, (False, 0))[0]
+                if name == "tfidf":
+                    num_vals = self.group_widths["tfidf"]
+                else:
+                    num_vals = ling_feature_groups[name].dims
                 if incl_feat:
                     feature_bools.extend([1] * num_vals)
                 else:
                     feature_bools.extend([0] * num_vals)
-        feature_idxs = np.nonzero(feature_bools)[0]
-        return X[:, feature_idxs]
+        return np.nonzero(feature_bools)[0]
+
+    def filter_features(self, X, feature_dicts):
+        """
+        Filters X, the inputs for model training, to contain only the features
+        specified in feature_dict.
+        """
+        return X[:, self.feature_columns(feature_dicts)]
 
-    def fit(self, X, Y):
+    def fit(self, X, Y, init=None):
         """
-        Fits the model on the input training data and labels.
+        Fits the model on the input training data and labels and returns the
+        number of solver iterations. If init, a (coef, intercept) pair, is
+        given the solver starts from it instead of from zeros, unless its
+        coefficients are not those of the columns of X.
         """
+        if init is not None and np.size(init[0]) != X.shape[1]:
+            init = None
+        self.model.warm_start = init is not None
+        if init is not None:
+            coef, intercept = init
+            self.model.coef_ = np.asarray(coef, dtype=float).reshape(1, -1)
+            self.model.intercept_ = np.atleast_1d(intercept).astype(float)
         self.model.fit(X, Y)
+        return int(self.model.n_iter_[0])
 
     def evaluate(self, X, Y):
         """
@@ -182,47 +323,172 @@ def run_baseline(Y):
     return baseline_acc
 
 
-def run_training(X, Y, voters, features, message):
+def cv_splits(n_samples):
+    """
+    Returns the (train_idx, test_idx) pairs of the 5-fold cross validation.
+    """
+    kf = KFold(n_splits=5, shuffle=True, random_state=1)
+    return list(kf.split(np.arange(n_samples)))
+
+
+def run_fold(model, X, fold, features, full_fit=None):
+    """
+    Trains the model on one cross validation fold restricted to the specified
+    set of features and returns its accuracy on the held out samples and the
+    number of solver iterations.
+
+    :param fold: Fold holding the rows, labels and persuadability of the fold
+    :param full_fit: optional (coef, intercept) of fit_full_fold on the same
+        fold, restricted to the config's columns to warm start the solver
+    """
+    # FILTER FEATURES FOR TRAINING, EXPANDING ONLY THE ROWS OF THIS FOLD
+    columns = model.feature_columns(features)
+    X_train = X.take(fold.train_idx, columns)
+    X_test = X.take(fold.test_idx, columns)
+
+    # ADD PERSUADABILITY FEATURE FOR TRAINING GROUP
+    persuade = features[0]["persuade"][0]
+    if persuade:
+        X_train = insert_column(X_train, fold.persuade_train)
+        X_test = insert_column(X_test, fold.persuade_test)
+
+    init = None
+    if full_fit is not None:
+        # The full model's persuadability coefficient comes first
+        coef, intercept = full_fit
+        init = (coef[full_columns(columns, persuade)], intercept)
+    with profiler.stage("training_fit"):
+        n_iter = model.fit(X_train, fold.Y_train, init)
+    with profiler.stage("training_evaluate"):
+        accuracy = model.evaluate(X_test, fold.Y_test)
+    return accuracy, n_iter
+
+
+def full_columns(columns, persuade):
+    """
+    Returns the indices of columns of X, plus the persuadability column if
+    persuade, among the columns of X with persuadability inserted first.
+    """
+    if persuade:
+        return np.concatenate(([0], columns + 1))
+    return columns + 1
+
+
+def run_fold_out_of_core(model, X, Y, voters, user_table, fold, features, options):
+    """
+    Out-of-core run_fold. The training rows of fold, a StreamFold, are
+    streamed from X in mini-batches of options.batch_size rows through a
+    StreamingLogReg, scaled with the fold's scaler, then the held out rows are
+    scored the same way. Returns the accuracy and the number of epochs.
+    """
+    columns = model.feature_columns(features)
+    persuade = features[0]["persuade"][0]
+    scaler = select_scaler(fold.scaler, full_columns(columns, persuade))
+    streaming_model = StreamingLogReg(options.epochs, options.seed)
+    with profiler.stage("training_fit"):
+        epochs = streaming_model.fit(
+            fold.loader(X, Y, voters, user_table, fold.train_counts, columns, persuade),
+            row_batches(fold.train_idx, options.batch_size),
+            scaler,
+        )
+    with profiler.stage("training_evaluate"):
+        accuracy = streaming_model.score(
+            fold.loader(X, Y, voters, user_table, fold.test_counts, columns, persuade),
+            row_batches(fold.test_idx, options.batch_size),
+        )
+    return accuracy, epochs
+
+
+def fit_full_fold(model, X, fold):
+    """
+    Trains the model on one cross validation fold with every column of X and
+    the persuadability feature, and returns its (coef, intercept). Every
+    config's columns are a subset of these, so the fit warm starts them all.
+    """
+    X_train = insert_column(X.take(fold.train_idx), fold.persuade_train)
+    with profiler.stage("training_full_fit"):
+        model.fit(X_train, fold.Y_train)
+    return model.model.coef_[0].copy(), model.model.intercept_[0]
+
+
+def report_training(message, accuracy, n_iter=None):
+    """
+    Prints and returns the mean accuracy over the cross validation folds,
+    printing the mean number of solver iterations as well if given.
+    """
+    print("\tModel: ", message, "\n")
+    avg_acc = np.mean(accuracy)
+    print("\tAccuracy: ", avg_acc, "\n")
+    if n_iter is not None:
+        print("\tSolver iterations: ", np.mean(n_iter), "\n")
+    print("=" * 50, "\n")
+    return avg_acc
+
+
+def run_training(model, X, Y, voters, user_table, features, message):
     """
     Trains a logistic regression model on the specified set of features.
     Evaluates the model using 5-fold cross validation.
 
-    :param X: array of all features
+    :param model: LogRegModel instance used to filter features and to train
+    :param X: DesignMatrix of all features
     :param Y: array of true labels
-    :param voters: flattened list of voters in training set
+    :param voters: array of the user_table ids of the voters in training set
+    :param user_table: UserTable of users, used for the persuadability feature
     :param features: dictionary mapping feature name to boolean
     :param message: message to print when showing results
     """
-    # FILTER FEATURES FOR TRAINING
-    X = model.filter_features(X, features)
-    print("\tModel: ", message, "\n")
+    accuracy, n_iter = [], []
+    for train_idx, test_idx in cv_splits(len(Y)):
+        fold = Fold(train_idx, test_idx, Y, voters, user_table)
+        fold_acc, fold_iter = run_fold(model, X, fold, features)
+        accuracy.append(fold_acc)
+        n_iter.append(fold_iter)
+    return report_training(message, accuracy, n_iter)
 
-    # SPLIT DATA FOR CROSS VALIDATION
-    accuracy = []
-    kf = KFold(n_splits=5, shuffle=True, random_state=1)
-    for train_idx, test_idx in kf.split(X):
-        X_train, X_test = X[train_idx], X[test_idx]
-        Y_train, Y_test = Y[train_idx], Y[test_idx]
-
-        # ADD PERSUADABILITY FEATURE FOR TRAINING GROUP
-        if features[0]['persuade'][0]:
-            v_train = [voters[idx] for idx in train_idx]
-            p = []
-            for voter in v_train:
-                p.append(get_persuadability(users, v_train, voter))
-            X_train = np.insert(X_train,0,p,axis=1)
-            v_test = [voters[idx] for idx in test_idx]
-            p = []
-            for voter in v_test:
-                p.append(get_persuadability(users, v_test, voter))
-            X_test = np.insert(X_test,0,p,axis=1)
-
-        model.fit(X_train, Y_train)
-        accuracy.append(model.evaluate(X_test, Y_test))
-    avg_acc = np.mean(accuracy)
-    print("\tAccuracy: ", avg_acc, "\n")
-    print("=" * 50, "\n")
-    return avg_acc
+
+def fold_job(shared, job):
+    """
+    Scheduler entry point evaluating one (config, fold) pair of a sweep.
+    """
+    datasets, user_table, folds, full_fits, options = shared
+    category, features, fold_idx = job
+    model, X, Y, voters = datasets[category]
+    fold = folds[category][fold_idx]
+    if options.out_of_core:
+        return run_fold_out_of_core(
+            model, X, Y, voters, user_table, fold, features, options
+        )
+    return run_fold(model, X, fold, features, full_fits.get((category, fold_idx)))
+
+
+def full_fold_job(shared, job):
+    """
+    Scheduler entry point fitting the full-feature model of one fold, see
+    fit_full_fold.
+    """
+    datasets, folds = shared
+    category, fold_idx = job
+    model, X, Y, voters = datasets[category]
+    return fit_full_fold(model, X, folds[category][fold_idx])
+
+
+def collect_configs(paths):
+    """
+    Expands the config paths given on the command line into an ordered list of
+    config files. Each path is either a json config or a directory, in which
+    case every json config below it is included in sorted order.
+    """
+    config_files = []
+    for path in paths:
+        for name in path.split(","):
+            if os.path.isdir(name):
+                pattern = os.path.join(name, "**", "*.json")
+                config_files.extend(sorted(glob.glob(pattern, recursive=True)))
+            # To ignore files like .DS_STORE
+            elif name[-4:] == "json":
+                config_files.append(name)
+    return config_files
 
 
 def parse_config(config_file):
@@ -246,43 +512,193 @@ def parse_config(config_file):
             config["ling_features"][k][0],
             config["ling_features"][k][1],
         )
+    # Check the feature groups against the registries, tfidf's width is only
+    # known after extraction
+    for registry, features in [
+        (user_feature_groups, config["user_features"]),
+        (ling_feature_groups, config["ling_features"]),
+    ]:
+        for k, (_, num_vals) in features.items():
+            if k == "tfidf":
+                continue
+            if k not in registry:
+                print("Unknown feature group", k, "in", config_file)
+                exit()
+            if registry[k].dims != num_vals:
+                print(
+                    "Feature group",
+                    k,
+                    "has",
+                    registry[k].dims,
+                    "columns, not",
+                    num_vals,
+                    "as in",
+                    config_file,
+                )
+                exit()
 
     return config
 
-def filter_samples(X, Y, majority_threshold):
+
+def filter_samples(Y, majority_threshold=0.5, randomness_threshold=0.5, seed=None):
+    """
+    Samples the dataset so that unchanged voters (label 0) make up about
+    majority_threshold of it. Every changed voter (label 1) is kept, and
+    unchanged voters are kept in order, each with probability
+    1 - randomness_threshold, until there are enough of them.
+
+    :param Y: array of labels
+    :param majority_threshold: wanted fraction of unchanged voters
+    :param randomness_threshold: probability of skipping an unchanged voter
+    :param seed: seed of the random draws
+    :return: sorted array of the indices of the kept samples
+    """
     # change their mind = 1
     # stay the same = 0
+    ones = Y == 1
+    one_count = np.count_nonzero(ones)
+    # number of 0s needed for the 1s to be the minority
+    zero_count = (one_count / (1 - majority_threshold)) - one_count
+    draws = np.random.default_rng(seed).random(len(Y)) > randomness_threshold
+    candidates = ~ones & draws
+    # keep candidates while fewer than zero_count have been kept
+    keep = ones | (candidates & (np.cumsum(candidates) <= np.ceil(zero_count)))
+    print(
+        "\tSampled",
+        one_count,
+        "changed and",
+        np.count_nonzero(keep) - one_count,
+        "unchanged voters\n",
+    )
+    return np.nonzero(keep)[0]
+
+
+def sample_rows(Y, options):
+    """
+    Returns the indices of the samples kept by filter_samples, shuffled with
+    the seed of options.
+    """
+    rows = shuffle(np.arange(len(Y)), random_state=options.seed)
+    return rows[
+        filter_samples(
+            Y[rows],
+            options.majority_threshold,
+            options.randomness_threshold,
+            options.seed,
+        )
+    ]
 
-    # LOGIC -----
-    # count number of ones in Y
-    one_count = collections.Counter(Y)[1]
-    # that number should be minority
-    # calculate number of 0s we need in the DS
-    zero_count = ((one_count / (1 - majority_threshold)) - one_count)
-    ret_X, ret_Y = [], []
-    ctr = 0
-    for i in range(len(X)):
-    # iterate
-        if Y[i] == 1:
-            # add it
-            ret_X += [X[i]]
-            ret_Y += [Y[i]]
-        else:
-            if ctr < zero_count and random.random() > 0.5:
-                ret_X += [X[i]]
-                ret_Y += [Y[i]]
-                ctr += 1
-    print(zero_count, one_count)
-    print(len(ret_X))
-    print(len(ret_Y))
-    # exit()
-    return np.array(ret_X), np.array(ret_Y)
 
+def load_dataset(data_path, categories=None):
+    """
+    Loads the DDO users and debates from the dataset directory. If the
+    directory holds a store written by ddo_store.py, the store is opened and
+    returned in place of the debates, and extract_features reads the columns
+    of a category from it directly. Otherwise users.json and debates.json are
+    streamed, keeping only the debates of the given categories (all if None)
+    that parse_debates would keep and only the fields the pipeline uses.
+
+    :return: (users, user_table, all_debates), where users is None and
+        all_debates is a DDOStore if the store is used
+    """
+    print("\n", "=" * 50, "\n\tLoading Dataset...\n")
+    store_path = os.path.join(data_path, store_folder)
+    if DDOStore.exists(store_path):
+        store = DDOStore(store_path)
+        user_table = store.user_table()
+        n_debates = len(store.select(categories, min_votes=10))
+        print("\t", n_debates, " debates and ", len(user_table), " users in store\n")
+        return None, user_table, store
+    users = load_users(os.path.join(data_path, "users.json"))
+    user_table = UserTable(users)
+    all_debates = dict(
+        stream_debates(os.path.join(data_path, "debates.json"), users, categories)
+    )
+    print("\t", len(all_debates), " debates and ", len(users), " users loaded\n")
+    return users, user_table, all_debates
+
+
+def prepare_dataset(
+    all_debates, users, user_table, category, options, feature_dicts=None
+):
+    """
+    Builds the full design matrix for one debate category. The matrix holds the
+    columns of every feature group enabled in any of feature_dicts, the
+    (user_features, ling_features) of the category's configs, so each config
+    of a sweep is evaluated as a column selection on it instead of a new
+    extraction.
+
+    With --out-of-core the rows are sampled first, the matrix of the sampled
+    rows is written to the feature store while its user features are computed
+    and it is returned memory-mapped. It is not standardized here but per fold.
+
+    :param options: command line options, see parse_args
+    :return: (model, X, Y, voters) ready to be passed to run_training
+    """
+    print("\tFiltered category of debates: ", category, "\n")
+    model = LogRegModel(
+        category,
+        options.cache,
+        options.chunk_size,
+        options.workers,
+        options.tfidf_features,
+        options.sparse_tfidf,
+    )
+    name = category or "all"
+    if options.out_of_core:
+        path = os.path.join(options.out_of_core, name)
+        with stages.stage("extract_features:" + name) as timer:
+            X, Y, voters = model.extract_features(
+                all_debates,
+                users,
+                user_table,
+                feature_dicts,
+                sample=lambda Y: sample_rows(Y, options),
+                path=path,
+                batch_size=options.batch_size,
+            )
+            timer.rows = len(Y)
+        print("\tFeature store written to:", path, "\n")
+        return model, X, Y, voters
+    with stages.stage("extract_features:" + name) as timer:
+        X, Y, voters = model.extract_features(
+            all_debates, users, user_table, feature_dicts
+        )
+        timer.rows = len(Y)
+    with stages.stage("standardize:" + name, len(Y)):
+        X.standardize()
+    print(X.shape)
+    print(Y.shape)
+    # Shuffle and sample row indices, only the user block is copied
+    with stages.stage("filter_samples:" + name, len(Y)):
+        rows = sample_rows(Y, options)
+    return model, X.subset(rows), Y[rows], voters[rows]
+
+
+def run_sweep(data_path, output_fname, config_files, options):
+    """
+    Runs every config in config_files in a single process and appends one row
+    per config to the output csv. Data is loaded once and the design matrix is
+    extracted once per category; configs only differ in the columns they keep.
+
+    The (config, fold) training jobs are spread across a pool of worker
+    processes. Results are merged in config order, so the csv is the same as
+    the one of a serial run with the same seed.
+
+    :param options: command line options, see parse_args
+    """
+    if options.profile:
+        profiler.enable()
+    if options.stage_report:
+        stages.enable(options.trace_memory)
+    configurations = []
+    for f_name in config_files:
+        print("\tCurrent Configuration:\t", f_name.split("/")[-1])
+        configurations.append((f_name, parse_config(f_name)))
+    if not configurations:
+        print("No config files to run. Quitting ...")
+        return
 
-if __name__ == "__main__":
-    if len(sys.argv) < 4:
-        print("Invalid number of arguments. Quitting ...")
-    data_path, output_fname, f_name = sys.argv[1], sys.argv[2], sys.argv[3]
     # Check if output file exists from prvious run
     if os.path.isfile(output_fname):
         output_file = open(output_fname, "a")
@@ -293,48 +709,226 @@ if __name__ == "__main__":
         header_row = ["Configuration", "Baseline", "Model"]
         writer.writerow(header_row)
 
-    # To ignore files like .DS_STORE
-    if f_name[-4:] == "json":
+    # LOAD DATA
+    categories = set(configuration["category"] for _, configuration in configurations)
+    if not all(categories):
+        categories = None
+    with stages.stage("load") as timer:
+        users, user_table, all_debates = load_dataset(data_path, categories)
+        timer.rows = len(all_debates)
+
+    # PROCESS DATA
+    print("\tProcessing Data...\n")
+
+    # Only the feature groups enabled by some config of a category are extracted
+    category_features = {}
+    for f_name, configuration in configurations:
+        category_features.setdefault(configuration["category"], []).append(
+            (configuration["user_features"], configuration["ling_features"])
+        )
 
-        print("\tCurrent Configuration:\t", f_name.split("/")[-1])
-        configuration = parse_config(f_name)
-
-        # LOAD DATA
-        print("\n", "=" * 50, "\n\tLoading Dataset...\n")
-        with open(data_path + "users.json", "r") as f:
-            users = json.load(f)
-        with open(data_path + "debates.json", "r") as f:
-            all_debates = json.load(f)
-        print("\t", len(all_debates), " debates and ", len(users), " users loaded\n")
-
-        # PROCESS DATA
-        print("\tProcessing Data...\n")
-        bigissues_dict = build_bigissues_dict(users)
-
-        # SPECIFY CATEGORIES, CREATE MODEL, FORMAT FEATURES
-        category = configuration[
-            "category"
-        ]  # one of: {None, 'Politics', 'Religion', 'Miscellaneous', ...}
-        print("\tFiltered category of debates: ", category, "\n")
-        model = LogRegModel(category)
-        vectorizer = TfidfVectorizer(
-            ngram_range=(1, 3), max_features=50, stop_words="english"
+    # one of: {None, 'Politics', 'Religion', 'Miscellaneous', ...}
+    datasets = {}
+    # Fold artifacts shared by every config of a category
+    fold_cache = FoldCache()
+    folds = {}
+    for f_name, configuration in configurations:
+        category = configuration["category"]
+        if category not in datasets:
+            datasets[category] = prepare_dataset(
+                all_debates,
+                users,
+                user_table,
+                category,
+                options,
+                category_features[category],
+            )
+            model, X, Y, voters = datasets[category]
+            with stages.stage("folds:" + (category or "all"), len(Y)):
+                if options.out_of_core:
+                    folds[category] = fold_cache.get(
+                        X, Y, voters, user_table, cv_splits(len(Y)), options.batch_size
+                    )
+                else:
+                    folds[category] = fold_cache.get(
+                        X, Y, voters, user_table, cv_splits(len(Y))
+                    )
+
+    # FIT THE FULL-FEATURE MODEL OF EVERY FOLD TO WARM START THE CONFIGS
+    full_fits = {}
+    if options.warm_start and not options.out_of_core:
+        full_jobs = [
+            (category, fold_idx)
+            for category in folds
+            for fold_idx in range(len(folds[category]))
+        ]
+        print("\tFitting", len(full_jobs), "full-feature models to warm start from\n")
+        # Every job fits on all rows of its category
+        rows = sum(len(datasets[category][2]) for category, _ in full_jobs)
+        with stages.stage("warm_start", rows):
+            fits = run_jobs(
+                full_fold_job, full_jobs, (datasets, folds), options.workers
+            )
+        full_fits = dict(zip(full_jobs, fits))
+
+    # SPECIFY FEATURES AND RUN MODELS
+    jobs = []
+    for f_name, configuration in configurations:
+        category = configuration["category"]
+        features = (configuration["user_features"], configuration["ling_features"])
+        for fold_idx in range(len(folds[category])):
+            jobs.append((category, features, fold_idx))
+    n_workers = min(resolve_workers(options.workers), len(jobs))
+    print("\tRunning", len(jobs), "training jobs on", n_workers, "workers\n")
+    # Every job trains and evaluates on all rows of its category
+    rows = sum(len(datasets[category][2]) for category, _, _ in jobs)
+    with stages.stage("training", rows):
+        results = run_jobs(
+            fold_job,
+            jobs,
+            (datasets, user_table, folds, full_fits, options),
+            options.workers,
         )
-        X, Y, voters = model.extract_features(all_debates, users, bigissues_dict)
-        scaler = StandardScaler()
-        X = scaler.fit_transform(X)
-        print(X.shape)
-        print(Y.shape)
-
-        # SPECIFY FEATURES AND RUN MODEL
-        user_features = configuration["user_features"]
-        ling_features = configuration["ling_features"]
-        features = (user_features, ling_features)
-        X, Y = shuffle(X, Y)
-        X, Y = filter_samples(X, Y, 0.5)
-        model_acc = run_training(X, Y, voters, features, f_name)
+
+    job_idx = 0
+    for f_name, configuration in configurations:
+        model, X, Y, voters = datasets[configuration["category"]]
+        n_folds = len(folds[configuration["category"]])
+        accuracy, n_iter = zip(*results[job_idx : job_idx + n_folds])
+        model_acc = report_training(f_name, accuracy, n_iter)
+        job_idx += n_folds
 
         baseline_acc = run_baseline(Y)
 
-        information = [f_name.split("/")[-1], baseline_acc, model_acc]
+        config_name = f_name.split("/")[-1]
+        if options.out_of_core:
+            # Another model than the lbfgs one, so keep its rows apart
+            config_name += " (out-of-core SGD)"
+        information = [config_name, baseline_acc, model_acc]
         writer.writerow(information)
+    output_file.close()
+
+    if options.profile:
+        profiler.write(options.profile)
+        print("\tProfile written to:", options.profile)
+    if options.stage_report:
+        report_fname = os.path.splitext(output_fname)[0] + "_stages.jsonl"
+        stages.append(report_fname, configs=len(configurations), workers=n_workers)
+        print("\tStage report appended to:", report_fname)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run persuasion ablations on the DDO dataset."
+    )
+    parser.add_argument(
+        "data_path",
+        help="directory containing users.json and debates.json, or the "
+        + store_folder
+        + " folder converted from them by ddo_store.py",
+    )
+    parser.add_argument("output_fname", help="csv file the results are appended to")
+    parser.add_argument(
+        "configs",
+        nargs="+",
+        help="config files and/or directories of configs (comma separated lists "
+        "are accepted as well)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes for extraction and training, 0 for one "
+        "per core",
+    )
+    parser.add_argument(
+        "-s",
+        "--seed",
+        type=int,
+        default=1,
+        help="seed for shuffling and sampling the data",
+    )
+    parser.add_argument(
+        "--majority-threshold",
+        type=float,
+        default=0.5,
+        help="wanted fraction of unchanged voters in the sampled dataset",
+    )
+    parser.add_argument(
+        "--randomness-threshold",
+        type=float,
+        default=0.5,
+        help="probability of skipping an unchanged voter when sampling",
+    )
+    parser.add_argument(
+        "--warm-start",
+        action="store_true",
+        help="start every config's solver from the coefficients of the "
+        "full-feature model of the same fold, which changes the accuracies "
+        "within the solver's tolerance",
+    )
+    parser.add_argument(
+        "--out-of-core",
+        metavar="DIR",
+        help="write the design matrices to a feature store in DIR and train "
+        "from it in streamed mini-batches with an SGD logistic regression",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10000,
+        help="number of rows per mini-batch in out-of-core mode",
+    )
+    parser.add_argument(
+        "--epochs",
+        type=int,
+        default=5,
+        help="number of passes over the training rows in out-of-core mode",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="write a json report of the time, calls, tokens and rows of every feature "
+        "extractor and of the tfidf, user feature and training stages to PATH",
+    )
+    parser.add_argument(
+        "--stage-report",
+        action="store_true",
+        help="append the time, rows per second and memory of every pipeline "
+        "stage as a json line to <output csv name>_stages.jsonl",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="also report the tracemalloc peak of every stage, which slows "
+        "allocations down",
+    )
+    parser.add_argument(
+        "--cache",
+        default="ttf_cache.sqlite",
+        help="path of the text feature cache database",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=100,
+        help="number of debates extracted between two commits to the cache",
+    )
+    parser.add_argument(
+        "--tfidf-features",
+        type=int,
+        default=50,
+        help="maximum number of TF-IDF n-gram features per side",
+    )
+    parser.add_argument(
+        "--sparse-tfidf",
+        action="store_true",
+        help="keep TF-IDF features sparse, scaled without centering",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_sweep(args.data_path, args.output_fname, collect_configs(args.configs), args)
@@ -0,0 +1,261 @@
+import sys
+import json
+import time
+import resource
+import tracemalloc
+
+
+class Timer:
+    """
+    Times one run of a profiled stage, see Profiler.stage. Tokens and rows
+    processed by the stage can be set on the timer before it exits.
+    """
+
+    def __init__(self, profiler, name, calls, tokens, rows):
+        self.profiler = profiler
+        self.name = name
+        self.calls = calls
+        self.tokens = tokens
+        self.rows = rows
+        # Time spent in stages run within this one
+        self.nested = 0.0
+
+    def __enter__(self):
+        self.profiler.active.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        self.profiler.active.pop()
+        if self.profiler.active:
+            self.profiler.active[-1].nested += seconds
+        self.profiler.add(
+            self.name,
+            seconds,
+            self.calls,
+            self.tokens,
+            seconds - self.nested,
+            self.rows,
+        )
+
+
+class NullTimer:
+    """
+    Timer of a disabled profiler or stage report, which records nothing. A
+    single instance is shared by every stage, so the rows, calls and tokens
+    set on it are ignored.
+    """
+
+    rows = calls = tokens = 0
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+null_timer = NullTimer()
+
+
+class Profiler:
+    """
+    Accumulates the wall time, number of calls and number of tokens and rows,
+    e.g. texts or votes, processed by every feature extractor and pipeline
+    stage. Stages may run within one
+    another, e.g. tokenization within the first feature group needing tokens,
+    so the self time of a stage, excluding the stages run within it, is kept
+    as well. Disabled by default, in which case a stage costs a single
+    attribute check.
+
+    Every process has its own profiler. Worker processes send the stats they
+    recorded since their last take() back with their results, and the parent
+    merges them, so the report covers every worker.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stats = {}
+        # Timers of the stages running, innermost last
+        self.active = []
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+        self.stats = {}
+
+    def add(self, name, seconds, calls=1, tokens=0, self_seconds=None, rows=0):
+        if self_seconds is None:
+            self_seconds = seconds
+        stat = self.stats.get(name)
+        if stat is None:
+            self.stats[name] = [seconds, self_seconds, calls, tokens, rows]
+        else:
+            stat[0] += seconds
+            stat[1] += self_seconds
+            stat[2] += calls
+            stat[3] += tokens
+            stat[4] += rows
+
+    def stage(self, name, calls=1, tokens=0, rows=0):
+        """
+        Returns a context manager timing the block it wraps as name. Each entry
+        into the stage counts as calls, usually one, and the tokens and rows it
+        processes are counted separately.
+        """
+        if not self.enabled:
+            return null_timer
+        return Timer(self, name, calls, tokens, rows)
+
+    def take(self):
+        """
+        Returns the stats recorded so far and clears them.
+        """
+        stats, self.stats = self.stats, {}
+        return stats
+
+    def merge(self, stats):
+        """
+        Adds the stats taken from another process.
+        """
+        for name, (seconds, self_seconds, calls, tokens, rows) in stats.items():
+            self.add(name, seconds, calls, tokens, self_seconds, rows)
+
+    def report(self):
+        """
+        Returns the stats of every stage, largest self time first.
+        """
+        report = {}
+        for name, (seconds, self_seconds, calls, tokens, rows) in sorted(
+            self.stats.items(), key=lambda item: -item[1][1]
+        ):
+            report[name] = {
+                "seconds": seconds,
+                "self_seconds": self_seconds,
+                "calls": calls,
+                "tokens": tokens,
+                "rows": rows,
+                "seconds_per_call": seconds / calls if calls else None,
+                "tokens_per_second": tokens / seconds if tokens and seconds else None,
+                "rows_per_second": rows / seconds if rows and seconds else None,
+            }
+        return report
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+# Profiler of the current process
+profiler = Profiler()
+
+
+def current_rss():
+    """
+    Returns the resident set size of this process in bytes, or None where
+    /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return None
+
+
+def peak_rss(who=resource.RUSAGE_SELF):
+    """
+    Returns the peak resident set size of this process, or of the largest of
+    its terminated child processes, in bytes.
+    """
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def megabytes(size):
+    return None if size is None else size / 2**20
+
+
+class StageTimer:
+    """
+    Measures one run of a pipeline stage, see StageReport.stage. The number of
+    rows processed by the stage can be set on the timer before it exits.
+    """
+
+    def __init__(self, report, name, rows):
+        self.report = report
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        if self.report.trace:
+            tracemalloc.reset_peak()
+        self.rss = current_rss()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        rss = current_rss()
+        record = {
+            "stage": self.name,
+            "seconds": seconds,
+            "rows": self.rows,
+            "rows_per_second": self.rows / seconds if self.rows and seconds else None,
+            "rss_mb": megabytes(rss),
+            "rss_growth_mb": None if rss is None else megabytes(rss - self.rss),
+            "peak_rss_mb": megabytes(peak_rss()),
+            "children_peak_rss_mb": megabytes(peak_rss(resource.RUSAGE_CHILDREN)),
+        }
+        if self.report.trace:
+            record["tracemalloc_peak_mb"] = megabytes(
+                tracemalloc.get_traced_memory()[1]
+            )
+        self.report.records.append(record)
+
+
+class StageReport:
+    """
+    Records the elapsed time, rows per second and memory of every stage of a
+    run, in the order they ran. Peak RSS is that of the process so far, since
+    the OS only tracks the lifetime peak. With trace, the tracemalloc peak of
+    the Python and numpy allocations made during each stage is recorded as
+    well, at the cost of slower allocations. Disabled by default.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace = False
+        self.records = []
+
+    def enable(self, trace=False):
+        self.enabled = True
+        self.trace = trace
+        self.records = []
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name, rows=0):
+        """
+        Returns a context manager measuring the block it wraps as name.
+        """
+        if not self.enabled:
+            return null_timer
+        return StageTimer(self, name, rows)
+
+    def append(self, path, **info):
+        """
+        Appends the records of this run, with info, as one json line to path,
+        so the file keeps the history of every run.
+        """
+        run = dict(time=time.strftime("%Y-%m-%d %H:%M:%S"), **info)
+        run["stages"] = self.records
+        with open(path, "a") as f:
+            f.write(json.dumps(run) + "\n")
+
+
+# Stage report of the current process
+stages = StageReport()
@@ -0,0 +1,83 @@
+import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from profiling import profiler
+
+# (func, shared, jobs) of the run in progress. Set before the pool is created so
+# forked workers inherit the (possibly large) shared data instead of receiving
+# a pickled copy with every job. Spawned workers receive one pickled copy each.
+_task = None
+
+
+def resolve_workers(workers):
+    """
+    Returns the number of worker processes to use, 0 or less meaning one per
+    core the process may run on.
+    """
+    if workers is None or workers <= 0:
+        if hasattr(os, "sched_getaffinity"):
+            return len(os.sched_getaffinity(0))
+        return os.cpu_count() or 1
+    return workers
+
+
+def pool_context():
+    """
+    Returns the multiprocessing context of worker pools. Fork is used where it
+    is available, so workers inherit the shared data, except on macOS where it
+    is unsafe with threaded BLAS backends. Elsewhere the platform's default,
+    spawn, is used, which requires jobs and shared data to be picklable.
+    """
+    if sys.platform != "darwin" and "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def _init_worker(task, profile):
+    global _task
+    if task is not None:
+        _task = task
+    # Forked workers inherit the parent's profiler stats, which the parent
+    # already has
+    profiler.enable(profile)
+
+
+def _call(job_idx):
+    func, shared, jobs = _task
+    return func(shared, jobs[job_idx]), profiler.take()
+
+
+def run_jobs(func, jobs, shared, workers=1):
+    """
+    Runs func(shared, job) for every job in jobs across a pool of worker
+    processes and returns the results in the order of jobs, so the output does
+    not depend on the number of workers or on which job finishes first. The
+    profiler stats of the workers are merged into those of this process.
+
+    :param func: module level function taking (shared, job)
+    :param jobs: list of job descriptions
+    :param shared: read-only data needed by every job, e.g. design matrices
+    :param workers: number of worker processes, 1 runs the jobs serially
+    """
+    global _task
+    workers = min(resolve_workers(workers), len(jobs))
+    if workers <= 1:
+        return [func(shared, job) for job in jobs]
+    _task = (func, shared, jobs)
+    try:
+        context = pool_context()
+        forked = context.get_start_method() == "fork"
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(None if forked else _task, profiler.enabled),
+        ) as pool:
+            results = []
+            for result, stats in pool.map(_call, range(len(jobs))):
+                profiler.merge(stats)
+                results.append(result)
+            return results
+    finally:
+        _task = None
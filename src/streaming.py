@@ -0,0 +1,148 @@
+import numpy as np
+from scipy import sparse
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+
+def row_batches(rows, batch_size):
+    """
+    Splits an array of row indices into consecutive batches of at most
+    batch_size rows.
+    """
+    return [
+        rows[start : start + batch_size] for start in range(0, len(rows), batch_size)
+    ]
+
+
+def fit_scaler(load, batches):
+    """
+    Accumulates the running mean and variance of every column over the batches
+    and returns the fitted StandardScaler. Sparse batches are only scaled, not
+    centered, like DesignMatrix.standardize does.
+
+    :param load: function returning the (X, Y) of an array of rows
+    :param batches: list of the row arrays of every batch
+    """
+    scaler = None
+    for rows in batches:
+        X_batch, _ = load(rows)
+        if scaler is None:
+            scaler = StandardScaler(with_mean=not sparse.issparse(X_batch))
+        scaler.partial_fit(X_batch)
+    return scaler
+
+
+def batch_stats(X_batch):
+    """
+    Returns the (count, mean, sum of squared deviations) of every column of a
+    dense or sparse batch, which merge_stats combines across batches.
+    """
+    count = X_batch.shape[0]
+    if sparse.issparse(X_batch):
+        mean = np.asarray(X_batch.sum(axis=0)).ravel() / count
+        squares = np.asarray(X_batch.multiply(X_batch).sum(axis=0)).ravel()
+        return count, mean, np.maximum(squares - count * np.square(mean), 0)
+    mean = X_batch.mean(axis=0)
+    return count, mean, np.square(X_batch - mean).sum(axis=0)
+
+
+def merge_stats(a, b):
+    """
+    Combines the batch_stats of two disjoint sets of rows, either of which may
+    be None.
+    """
+    if a is None or b is None:
+        return b if a is None else a
+    count_a, mean_a, m2_a = a
+    count_b, mean_b, m2_b = b
+    count = count_a + count_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * count_b / count
+    m2 = m2_a + m2_b + np.square(delta) * count_a * count_b / count
+    return count, mean, m2
+
+
+def stats_scaler(stats, with_mean=True):
+    """
+    Returns the StandardScaler fitted to rows with the given batch_stats, the
+    same as partial_fit over those rows gives.
+    """
+    count, mean, m2 = stats
+    variance = m2 / count
+    # Constant columns are left unscaled, like StandardScaler does
+    eps = np.finfo(np.float64).eps
+    constant = variance <= count * eps * variance + (count * mean * eps) ** 2
+    scale = np.sqrt(variance)
+    scale[constant] = 1.0
+    scaler = StandardScaler(with_mean=with_mean)
+    scaler.mean_ = mean
+    scaler.var_ = variance
+    scaler.scale_ = scale
+    scaler.n_samples_seen_ = count
+    scaler.n_features_in_ = len(mean)
+    return scaler
+
+
+def select_scaler(scaler, columns):
+    """
+    Returns a copy of a fitted StandardScaler restricted to columns.
+    """
+    selected = StandardScaler(with_mean=scaler.with_mean)
+    selected.mean_ = scaler.mean_[columns]
+    selected.var_ = scaler.var_[columns]
+    selected.scale_ = scaler.scale_[columns]
+    selected.n_samples_seen_ = scaler.n_samples_seen_
+    selected.n_features_in_ = len(columns)
+    return selected
+
+
+class StreamingLogReg:
+    """
+    Out-of-core logistic regression. The model is fit by stochastic gradient
+    descent on the logistic loss, one mini-batch of rows at a time, after a
+    first pass over the batches has accumulated the running mean and variance
+    of every column, so no more than one batch is ever held in memory.
+    """
+
+    def __init__(self, epochs=5, seed=None):
+        """
+        :param epochs: number of passes over the training batches
+        :param seed: seed of the batch order and of the SGD solver
+        """
+        self.epochs = epochs
+        self.seed = seed
+        self.scaler = None
+        self.model = None
+
+    def fit(self, load, batches, scaler=None):
+        """
+        Fits the scaler and the model on the batches and returns the number of
+        epochs run.
+
+        :param load: function returning the (X, Y) of an array of rows
+        :param batches: list of the row arrays of every batch
+        :param scaler: already fitted StandardScaler of the batches, which
+            saves the pass fitting it
+        """
+        rng = np.random.default_rng(self.seed)
+        self.scaler = scaler or fit_scaler(load, batches)
+        self.model = SGDClassifier(loss="log_loss", random_state=self.seed)
+        for _ in range(self.epochs):
+            for batch_idx in rng.permutation(len(batches)):
+                X_batch, Y_batch = load(batches[batch_idx])
+                self.model.partial_fit(
+                    self.scaler.transform(X_batch), Y_batch, classes=[0, 1]
+                )
+        return self.epochs
+
+    def score(self, load, batches):
+        """
+        Returns the mean accuracy over the batches, see fit.
+        """
+        correct, total = 0, 0
+        for rows in batches:
+            X_batch, Y_batch = load(rows)
+            preds = self.model.predict(self.scaler.transform(X_batch))
+            correct += np.count_nonzero(preds == Y_batch)
+            total += len(Y_batch)
+        return correct / total
@@ -0,0 +1,423 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+# The 48 big issues of a DDO profile, in the order of big_issues_dict
+big_issues = [
+    "Abortion",
+    "Affirmative Action",
+    "Animal Rights",
+    "Barack Obama",
+    "Border Fence",
+    "Capitalism",
+    "Civil Unions",
+    "Death Penalty",
+    "Drug Legalization",
+    "Electoral College",
+    "Environmental Protection",
+    "Estate Tax",
+    "European Union",
+    "Euthanasia",
+    "Federal Reserve",
+    "Flat Tax",
+    "Free Trade",
+    "Gay Marriage",
+    "Global Warming Exists",
+    "Globalization",
+    "Gold Standard",
+    "Gun Rights",
+    "Homeschooling",
+    "Internet Censorship",
+    "Iran-Iraq War",
+    "Labor Union",
+    "Legalized Prostitution",
+    "Medicaid & Medicare",
+    "Medical Marijuana",
+    "Military Intervention",
+    "Minimum Wage",
+    "National Health Care",
+    "National Retail Sales Tax",
+    "Occupy Movement",
+    "Progressive Tax",
+    "Racial Profiling",
+    "Redistribution",
+    "Smoking Ban",
+    "Social Programs",
+    "Social Security",
+    "Socialism",
+    "Stimulus Spending",
+    "Term Limits",
+    "Torture",
+    "United Nations",
+    "War in Afghanistan",
+    "War on Terror",
+    "Welfare",
+]
+stances = ["Pro", "Con", "Und", "N/O", "N/S"]
+
+# (value, probability) of the categorical profile fields
+genders = [
+    ("Male", 0.55),
+    ("Prefer not to say", 0.25),
+    ("Female", 0.15),
+    ("Genderqueer", 0.02),
+    ("Androgyne", 0.01),
+    ("Transgender Female", 0.01),
+    ("Transgender Male", 0.01),
+]
+political_ideologies = [
+    ("Not Saying", 0.45),
+    ("Liberal", 0.1),
+    ("Conservative", 0.1),
+    ("Libertarian", 0.07),
+    ("Moderate", 0.06),
+    ("Progressive", 0.04),
+    ("Other", 0.04),
+    ("Socialist", 0.03),
+    ("Republican", 0.03),
+    ("Democrat", 0.03),
+    ("Undecided", 0.03),
+    ("Anarchist", 0.02),
+]
+religious_ideologies = [
+    ("Not Saying", 0.4),
+    ("Atheist", 0.15),
+    ("Christian", 0.15),
+    ("Agnostic", 0.1),
+    ("Christian - Catholic", 0.05),
+    ("Other", 0.05),
+    ("Christian - Protestant", 0.04),
+    ("Muslim", 0.02),
+    ("Deist", 0.02),
+    ("Buddhist", 0.02),
+]
+categories = [
+    ("Politics", 0.2),
+    ("Religion", 0.15),
+    ("Miscellaneous", 0.1),
+    ("Society", 0.1),
+    ("Philosophy", 0.08),
+    ("Science", 0.06),
+    ("Entertainment", 0.05),
+    ("Games", 0.05),
+    ("Education", 0.04),
+    ("Sports", 0.04),
+    ("Technology", 0.03),
+    ("Economics", 0.03),
+    ("People", 0.03),
+    ("Movies", 0.02),
+    ("News", 0.02),
+    ("Health", 0.02),
+    ("Arts", 0.02),
+    ("Funny", 0.02),
+    ("Cars", 0.01),
+    ("Fashion", 0.01),
+    ("TV", 0.01),
+    ("Music", 0.01),
+]
+months = [
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+]
+
+# Words of the debate texts, drawn with Zipf frequencies in this order, and
+# phrases opening some of the sentences. Both include words of the lexicons
+# so that every linguistic feature is exercised.
+vocabulary = (
+    "the of and to a in that is it i you my for this be not on are as with "
+    "we they have but would should will can if your opponent which there "
+    "people their because do or so all was more what argument he one by "
+    "evidence could must may might no also has government point believe "
+    "think god right law does many only just any other first shall society "
+    "life never always however therefore good bad wrong true "
+    "false please thank clearly obviously certainly perhaps possibly "
+    "stupid damn hell love hate great terrible moral freedom rights state "
+    "human death war peace money tax children women men science religion "
+    "source study research fact facts proof prove shows data percent"
+).split()
+openers = [
+    "I believe",
+    "I think",
+    "In my opinion",
+    "My opponent claims",
+    "According to",
+    "Studies show that",
+    "First of all",
+    "In conclusion",
+    "Thank you for",
+    "Please note that",
+    "It is clear that",
+    "However",
+    "Therefore",
+]
+sentence_ends = [".", ".", ".", "?", "!"]
+forfeit = "This round has not been posted yet."
+vote_criteria = [
+    ("Who had better conduct", 1),
+    ("Had better spelling and grammar", 1),
+    ("Made more convincing arguments", 3),
+    ("Used the most reliable sources", 2),
+]
+
+
+def pick(rng, table, size=None):
+    """
+    Draws values of a (value, probability) table.
+    """
+    values = [value for value, _ in table]
+    p = np.array([prob for _, prob in table])
+    idx = rng.choice(len(values), size=size, p=p / p.sum())
+    if size is None:
+        return values[idx]
+    return [values[i] for i in idx]
+
+
+def write_json_object(path, items):
+    """
+    Writes (key, value) pairs as one JSON object, one pair at a time, so the
+    output never has to fit in memory.
+    """
+    with open(path, "w") as f:
+        f.write("{")
+        for idx, (key, value) in enumerate(items):
+            if idx:
+                f.write(", ")
+            f.write(json.dumps(key) + ": " + json.dumps(value))
+        f.write("}")
+
+
+class SyntheticDDO:
+    """
+    Generator of a synthetic DDO dataset with the schema of users.json and
+    debates.json: every field read by parse_debates, votes_to_labels,
+    build_bigissues_dict, get_gender, get_matching and the data_stats
+    scripts. Distributions mimic the real corpus: skewed profile fields, many
+    undisclosed big issues, a heavy-tailed user activity, log-normal text
+    lengths with occasional forfeits, and a zero-inflated, heavy-tailed number
+    of votes per debate. Voters have a personal tendency to change their mind,
+    so labels of the same voter are correlated, as in the real corpus.
+    """
+
+    def __init__(self, n_users, n_debates, voters_per_debate=10, seed=0):
+        """
+        :param n_users: number of users in users.json
+        :param n_debates: number of debates in debates.json
+        :param voters_per_debate: mean number of votes of a debate
+        :param seed: seed of every random draw, equal seeds give equal files
+        """
+        self.n_users = n_users
+        self.n_debates = n_debates
+        self.voters_per_debate = voters_per_debate
+        self.rng = np.random.default_rng(seed)
+        self.names = ["user_%d" % idx for idx in range(n_users)]
+        # Heavy-tailed activity, a few users take part in most debates
+        activity = self.rng.pareto(1.5, n_users) + 1
+        self.activity_cdf = np.cumsum(activity) / activity.sum()
+        self.fickleness = self.rng.beta(1, 4, n_users)
+        self.voted_debates = np.zeros(n_users, dtype=np.int64)
+        word_rank = np.arange(1, len(vocabulary) + 1)
+        self.word_p = (1 / word_rank) / (1 / word_rank).sum()
+
+    def sample_users(self, size):
+        """
+        Returns the indices of up to size distinct users, drawn by activity.
+        """
+        draws = np.searchsorted(self.activity_cdf, self.rng.random(size))
+        return list(dict.fromkeys(np.minimum(draws, self.n_users - 1).tolist()))
+
+    def user(self, idx):
+        rng = self.rng
+        if rng.random() < 0.5:
+            # Half of the users never fill in their big issues
+            issues = ["N/S"] * len(big_issues)
+        else:
+            issues = pick(rng, list(zip(stances, rng.dirichlet(np.ones(5)))), 48)
+        if rng.random() < 0.6:
+            birthday = "- Private -"
+        else:
+            birthday = "%s %d, %d" % (
+                months[rng.integers(12)],
+                rng.integers(1, 29),
+                rng.integers(1950, 2005),
+            )
+        # Users also voted on debates that are not in the corpus
+        extra = int(rng.geometric(0.2)) - 1
+        return {
+            "gender": pick(rng, genders),
+            "political_ideology": pick(rng, political_ideologies),
+            "religious_ideology": pick(rng, religious_ideologies),
+            "birthday": birthday,
+            "big_issues_dict": dict(zip(big_issues, issues)),
+            "number_of_voted_debates": int(self.voted_debates[idx] + extra),
+        }
+
+    def text(self):
+        """
+        Returns the text of one side of a round.
+        """
+        rng = self.rng
+        if rng.random() < 0.05:
+            return forfeit
+        n_words = max(1, int(rng.lognormal(5.3, 0.9)))
+        words = rng.choice(len(vocabulary), size=n_words, p=self.word_p).tolist()
+        # Sentences of 5 to 24 words, drawn at once with their decorations
+        bounds = np.cumsum(rng.integers(5, 25, size=n_words // 5 + 1))
+        bounds = [0] + bounds[bounds < n_words].tolist() + [n_words]
+        n_sentences = len(bounds) - 1
+        decorations = rng.random(n_sentences).tolist()
+        numbers = rng.integers(1, 1000, size=n_sentences).tolist()
+        ends = rng.choice(len(sentence_ends), size=n_sentences).tolist()
+        sentences = []
+        for idx in range(n_sentences):
+            sentence = " ".join(
+                vocabulary[word] for word in words[bounds[idx] : bounds[idx + 1]]
+            )
+            if decorations[idx] < 0.2:
+                sentence = openers[numbers[idx] % len(openers)] + " " + sentence
+            elif decorations[idx] < 0.24:
+                sentence += " %d" % numbers[idx]
+            elif decorations[idx] < 0.26:
+                sentence += " http://www.example.com/%d" % numbers[idx]
+            sentence = sentence[0].upper() + sentence[1:]
+            sentences.append(sentence + sentence_ends[ends[idx]])
+        return " ".join(sentences)
+
+    def votes_map(self, voter, participants, better):
+        """
+        Returns a votes_map. The voter agrees with one of the debaters or with
+        "Tied" before the debate and, depending on their fickleness, switches
+        after it, more likely to the better debater.
+        """
+        rng = self.rng
+        keys = participants + ["Tied"]
+        before = rng.choice(3, p=[0.35, 0.35, 0.3])
+        after = before
+        if rng.random() < self.fickleness[voter]:
+            p = np.where(np.arange(3) == better, 0.6, 0.2)
+            p[before] = 0
+            after = rng.choice(3, p=p / p.sum())
+        votes_map = {}
+        for idx, key in enumerate(keys):
+            choice = {
+                "Agreed with before the debate": bool(idx == before),
+                "Agreed with after the debate": bool(idx == after),
+            }
+            points = 0
+            for criterion, value in vote_criteria:
+                won = idx == (better if rng.random() < 0.6 else rng.integers(3))
+                choice[criterion] = bool(won)
+                points += value * won
+            choice["Total points awarded"] = str(points)
+            votes_map[key] = choice
+        return votes_map
+
+    def debate(self, idx):
+        rng = self.rng
+        participants = [self.names[user] for user in self.sample_users(8)[:2]]
+        while len(participants) < 2:
+            participants.append("deleted_user_%d" % rng.integers(self.n_users + 1))
+        if rng.random() < 0.02:
+            # Accounts of some debaters no longer exist
+            participants[rng.integers(2)] = "deleted_user_%d" % idx
+        position = "Pro" if rng.random() < 0.5 else "Con"
+        other = "Con" if position == "Pro" else "Pro"
+        rounds = [
+            [
+                {"side": position, "text": self.text()},
+                {"side": other, "text": self.text()},
+            ]
+            for _ in range(rng.integers(3, 6))
+        ]
+        # Zero-inflated, heavy-tailed number of votes with the given mean
+        n_votes = rng.negative_binomial(0.8, 0.8 / (0.8 + self.voters_per_debate))
+        better = rng.integers(2)
+        votes = []
+        for voter in self.sample_users(2 * n_votes)[:n_votes]:
+            if self.names[voter] in participants:
+                continue
+            self.voted_debates[voter] += 1
+            votes.append(
+                {
+                    "user_name": self.names[voter],
+                    "votes_map": self.votes_map(voter, participants, better),
+                }
+            )
+        title = " ".join(
+            vocabulary[word].capitalize()
+            for word in rng.choice(len(vocabulary), size=rng.integers(2, 7))
+        )
+        return {
+            "title": title,
+            "category": pick(rng, categories),
+            "participant_1_name": participants[0],
+            "participant_2_name": participants[1],
+            "participant_1_position": position,
+            "rounds": rounds,
+            "votes": votes,
+        }
+
+    def dataset(self):
+        """
+        Returns the users and debates dictionaries that write would write.
+        """
+        debates = {"debate_%d" % idx: self.debate(idx) for idx in range(self.n_debates)}
+        users = {self.names[idx]: self.user(idx) for idx in range(self.n_users)}
+        return users, debates
+
+    def write(self, out_path):
+        """
+        Writes debates.json, then users.json, whose numbers of voted debates
+        count the generated votes, to out_path.
+        """
+        os.makedirs(out_path, exist_ok=True)
+        write_json_object(
+            os.path.join(out_path, "debates.json"),
+            (("debate_%d" % idx, self.debate(idx)) for idx in range(self.n_debates)),
+        )
+        write_json_object(
+            os.path.join(out_path, "users.json"),
+            ((self.names[idx], self.user(idx)) for idx in range(self.n_users)),
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic DDO dataset for scale testing."
+    )
+    parser.add_argument(
+        "out_path", help="directory users.json and debates.json are written to"
+    )
+    parser.add_argument("-u", "--users", type=int, default=2000, help="number of users")
+    parser.add_argument(
+        "-d", "--debates", type=int, default=1000, help="number of debates"
+    )
+    parser.add_argument(
+        "-v",
+        "--voters",
+        type=float,
+        default=10,
+        help="mean number of voters per debate",
+    )
+    parser.add_argument("-s", "--seed", type=int, default=0, help="random seed")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    print("\n", "=" * 50, "\n\tGenerating Dataset...\n")
+    SyntheticDDO(args.users, args.debates, args.voters, args.seed).write(args.out_path)
+    print(
+        "\t", args.debates, "debates and", args.users, "users written to", args.out_path
+    )
@@ -1,6 +1,6 @@
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import scipy.spatial as sp
+from feature_groups import FeatureGroup
 
 # from data_processing import changed_mind, was_flipped, was_convinced
 
@@ -134,20 +134,267 @@ def get_gender(users, voter_name, debater_1, debater_2):
     return voter_gender + matches
 
 
+def normalize_issues(issues):
+    """
+    Scales every issue vector of a (..., 48, 4) big issues array to unit
+    length, leaving all-zero vectors as they are, like cosine_similarity does.
+    """
+    norms = np.linalg.norm(issues, axis=-1, keepdims=True)
+    return np.divide(issues, norms, out=np.zeros_like(issues), where=norms != 0)
+
+
 def get_bigissues(issues_dict, voter_name, debater_name):
     """
     Computes the cossine similarities of each issue for two users' big issues
     vectors, returning the average.
     """
-    voter_issues = issues_dict[voter_name]
-    debater_issues = issues_dict[debater_name]
-    sims = []
-    for v, d in zip(voter_issues, debater_issues):
-        sims.append(cosine_similarity([v], [d]))
-    return np.mean(sims)
+    voter_issues = normalize_issues(issues_dict[voter_name])
+    debater_issues = normalize_issues(issues_dict[debater_name])
+    return np.mean(np.einsum("ik,ik->i", voter_issues, debater_issues))
+
+
+def bigissues_similarity(normalized_issues, voter_ids, debater_ids, batch_size=65536):
+    """
+    Vectorized get_bigissues for many (voter, debater) pairs at once.
+
+    :param normalized_issues: (users x 48 x 4) array of normalize_issues output
+    :param voter_ids: integer array of voter rows in normalized_issues
+    :param debater_ids: integer array of debater rows in normalized_issues
+    :param batch_size: number of pairs gathered at a time, bounds the memory
+    :return: array of the mean per-issue cosine similarity of every pair
+    """
+    sims = np.empty(len(voter_ids))
+    for start in range(0, len(voter_ids), batch_size):
+        end = start + batch_size
+        voter_issues = normalized_issues[voter_ids[start:end]]
+        debater_issues = normalized_issues[debater_ids[start:end]]
+        issue_sims = np.einsum("pik,pik->pi", voter_issues, debater_issues)
+        sims[start:end] = issue_sims.mean(axis=1)
+    return sims
 
 
 def get_decidedness(issues_dict, voter_name):
     voter_issues = issues_dict[voter_name]
     voter_sums = np.sum(voter_issues, axis=0)
     return voter_sums[0] + voter_sums[1], voter_sums[2] + voter_sums[3]
+
+
+class UserTable:
+    """
+    Compact copy of the user attributes used for feature generation. Users are
+    interned to integer ids and their categorical attributes are encoded in
+    NumPy arrays, so that the user features of many (voter, debater) pairs are
+    computed with vectorized gathers instead of per-vote dictionary lookups.
+    """
+
+    def __init__(self, users, issues_dict=None):
+        """
+        :param users: the original dictionary of users
+        :param issues_dict: output of build_bigissues_dict, built if None
+        """
+        if issues_dict is None:
+            issues_dict = build_bigissues_dict(users)
+        names = list(users)
+        political_values, political = np.unique(
+            [users[name]["political_ideology"] for name in names], return_inverse=True
+        )
+        gender_values, gender = np.unique(
+            [users[name]["gender"] for name in names], return_inverse=True
+        )
+        self.set_columns(
+            names,
+            political_values,
+            political,
+            gender_values,
+            gender,
+            np.array([int(users[name]["number_of_voted_debates"]) for name in names]),
+            np.stack([issues_dict[name] for name in names]),
+        )
+
+    @classmethod
+    def from_columns(cls, *columns):
+        """
+        Creates a UserTable from already encoded columns, see set_columns.
+        """
+        table = cls.__new__(cls)
+        table.set_columns(*columns)
+        return table
+
+    def set_columns(
+        self,
+        names,
+        political_values,
+        political,
+        gender_values,
+        gender,
+        voted_debates,
+        issues,
+    ):
+        """
+        :param names: list of user names, in id order
+        :param political_values: sorted array of political ideologies
+        :param political: array of every user's code in political_values
+        :param gender_values: sorted array of genders
+        :param gender: array of every user's code in gender_values
+        :param voted_debates: array of every user's number of voted debates
+        :param issues: (users x 48 x 4) array of build_bigissues_dict vectors
+        """
+        self.names = names
+        self.ids = {name: idx for idx, name in enumerate(self.names)}
+        self.political_values, self.political = political_values, political
+        self.gender_values, self.gender = gender_values, gender
+        self.voted_debates = voted_debates
+        self.normalized_issues = normalize_issues(issues)
+
+        # Voter-only features, computed once per user
+        issue_sums = issues.sum(axis=1)
+        decided = issue_sums[:, 0] + issue_sums[:, 1]
+        undecided = issue_sums[:, 2] + issue_sums[:, 3]
+        self.decidedness = np.stack((decided, undecided), axis=1)
+        female = self.gender == self.code("gender", "Female")
+        male = self.gender == self.code("gender", "Male")
+        self.gender_onehot = np.stack((female, male), axis=1).astype(int)
+
+    def __len__(self):
+        return len(self.names)
+
+    def code(self, attribute, value):
+        """
+        Returns the integer code of value for attribute "political" or
+        "gender", or -1 if no user has that value.
+        """
+        values = getattr(self, attribute + "_values")
+        idx = np.searchsorted(values, value)
+        if idx < len(values) and values[idx] == value:
+            return idx
+        return -1
+
+    def lookup(self, names):
+        """
+        Returns the integer ids of a list of user names.
+        """
+        return np.array([self.ids[name] for name in names], dtype=np.int64)
+
+    def persuade_counts(self, voter_ids):
+        """
+        Returns the number of occurrences of every user id in voter_ids.
+        """
+        return np.bincount(voter_ids, minlength=len(self))
+
+    def persuadability(self, voter_ids, counts=None):
+        """
+        Vectorized get_persuadability of every voter in voter_ids, the integer
+        ids of the debate_voters, computed from a single count of voter_ids.
+        If counts, the persuade_counts of a larger set of debate_voters that
+        includes voter_ids, is given, the scores are those within that set.
+        """
+        if counts is None:
+            counts = self.persuade_counts(voter_ids)
+        totals = self.voted_debates[voter_ids]
+        return np.divide(
+            counts[voter_ids],
+            totals,
+            out=np.zeros(len(voter_ids)),
+            where=totals != 0,
+        )
+
+    def matching(self, voter_ids, debater_ids):
+        """
+        Vectorized get_matching for many (voter, debater) pairs.
+        """
+        not_saying = self.code("political", "Not Saying")
+        voter_ideology = self.political[voter_ids]
+        debater_ideology = self.political[debater_ids]
+        return (
+            (voter_ideology == debater_ideology)
+            & (voter_ideology != not_saying)
+            & (debater_ideology != not_saying)
+        ).astype(int)
+
+    def opinion(self, voter_ids, debater1_ids, debater2_ids):
+        """
+        Big issues similarity of every voter to both debaters.
+        """
+        return np.stack(
+            (
+                bigissues_similarity(self.normalized_issues, voter_ids, debater1_ids),
+                bigissues_similarity(self.normalized_issues, voter_ids, debater2_ids),
+            ),
+            axis=1,
+        )
+
+    def ideology_matching(self, voter_ids, debater1_ids, debater2_ids):
+        """
+        Political ideology matches of every voter with both debaters.
+        """
+        return np.stack(
+            (
+                self.matching(voter_ids, debater1_ids),
+                self.matching(voter_ids, debater2_ids),
+            ),
+            axis=1,
+        )
+
+    def gender_features(self, voter_ids, debater1_ids, debater2_ids):
+        """
+        One-hot female/male gender of every voter and its gender matches with
+        both debaters.
+        """
+        # Gender matches only count for voters that are female or male
+        voter_gender = self.gender[voter_ids]
+        gender_known = self.gender_onehot[voter_ids].any(axis=1)
+        gender_matches = np.stack(
+            (
+                (voter_gender == self.gender[debater1_ids]) & gender_known,
+                (voter_gender == self.gender[debater2_ids]) & gender_known,
+            ),
+            axis=1,
+        )
+        return np.column_stack(
+            (self.gender_onehot[voter_ids], gender_matches.astype(int))
+        )
+
+    def pair_features(self, voter_ids, debater1_ids, debater2_ids, groups=None):
+        """
+        Returns the (pairs x 12) array of user features of every vote, in the
+        column order of the config's user features: opinion (big issues
+        similarity to both debaters), pol_ideology, rel_ideology, decidedness,
+        undecidedness and gender. If groups, a list of names of
+        user_feature_groups, is given only the columns of those are computed.
+        """
+        if groups is None:
+            groups = list(user_feature_groups)
+        columns = [np.empty((len(voter_ids), 0))]
+        for name in groups:
+            group = user_feature_groups[name]
+            if group.compute is not None:
+                columns.append(
+                    group.compute(self, voter_ids, debater1_ids, debater2_ids)
+                )
+        return np.column_stack(columns)
+
+
+# User feature groups, in the column order of the configs' user_features. The
+# persuadability of a voter depends on the training rows of a fold, so it has
+# no columns here and is inserted per fold.
+user_feature_groups = {
+    group.name: group
+    for group in [
+        FeatureGroup("persuade", 0, None),
+        FeatureGroup("opinion", 2, UserTable.opinion),
+        FeatureGroup("pol_ideology", 2, UserTable.ideology_matching),
+        # get_matching compares political ideologies for "Religion" too
+        FeatureGroup("rel_ideology", 2, UserTable.ideology_matching),
+        FeatureGroup(
+            "decidedness",
+            1,
+            lambda table, voter_ids, *debater_ids: table.decidedness[voter_ids, :1],
+        ),
+        FeatureGroup(
+            "undecidedness",
+            1,
+            lambda table, voter_ids, *debater_ids: table.decidedness[voter_ids, 1:],
+        ),
+        FeatureGroup("gender", 4, UserTable.gender_features),
+    ]
+}
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+src_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+sys.path.insert(0, src_dir)
+
+
+@pytest.fixture(autouse=True)
+def run_from_src(monkeypatch):
+    # Lexicon paths are relative to src/, where the scripts are run from
+    monkeypatch.chdir(src_dir)
+
+
+@pytest.fixture(scope="session")
+def synthetic():
+    from synthetic_data import SyntheticDDO
+
+    return SyntheticDDO(300, 60, voters_per_debate=10, seed=0).dataset()
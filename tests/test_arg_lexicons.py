@@ -0,0 +1,117 @@
+import random
+import re
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+import pytest
+
+import language_features as lf
+
+lexicon_paths = [lf.arg_lex_folder + name + ".tff" for name in lf.arg_lexicon_names]
+
+category_chars = {
+    sre_constants.CATEGORY_DIGIT: "7",
+    sre_constants.CATEGORY_WORD: "w",
+    sre_constants.CATEGORY_SPACE: " ",
+}
+
+
+def generate(parsed, rng):
+    """
+    Returns a random string matched by a parsed regex, repeating quantified
+    items a random number of times.
+    """
+    out = []
+    for op, arg in parsed:
+        if op == sre_constants.LITERAL:
+            out.append(chr(arg))
+        elif op == sre_constants.ANY:
+            out.append("x")
+        elif op == sre_constants.IN:
+            kind, value = arg[0]
+            if kind == sre_constants.LITERAL:
+                out.append(chr(value))
+            elif kind == sre_constants.RANGE:
+                out.append(chr(value[0]))
+            elif kind == sre_constants.CATEGORY:
+                out.append(category_chars.get(value, "w"))
+            else:
+                out.append(" ")
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, high, item = arg
+            high = min(high, low + 3)
+            for _ in range(rng.randint(low, high)):
+                out.append(generate(item, rng))
+        elif op == sre_constants.SUBPATTERN:
+            out.append(generate(arg[-1], rng))
+        elif op == sre_constants.BRANCH:
+            out.append(generate(rng.choice(arg[1]), rng))
+        elif op == sre_constants.CATEGORY:
+            out.append(category_chars.get(arg, "w"))
+    return "".join(out)
+
+
+def baseline_arg_lexicon_check(string, lexicon_name):
+    # arg_lexicon_check before the patterns were compiled once and prefiltered
+    count = 0
+    for regex in lf.read_arg_regex(lexicon_name, lf.read_macros()):
+        if re.compile(regex).search(string):
+            count += 1
+    return count
+
+
+def lexicon_patterns():
+    macros = lf.read_macros()
+    return sorted(
+        {regex for path in lexicon_paths for regex in lf.read_arg_regex(path, macros)}
+    )
+
+
+@pytest.mark.parametrize(
+    "regex, literal",
+    [
+        ("abc", "abc"),
+        ("ab+c", "ab"),
+        ("xy?z", "x"),
+        ("ab*cd", "cd"),
+        ("a{2}bcd", "bcd"),
+        ("ab|cd", ""),
+        ("(the|my) point is", " point is"),
+        ("i\\'m sure", "i'm sure"),
+        ("[ab]cde", "cde"),
+    ],
+)
+def test_required_literal(regex, literal):
+    assert lf.required_literal(regex) == literal
+
+
+def test_required_literal_of_every_pattern():
+    rng = random.Random(0)
+    for regex in lexicon_patterns():
+        literal = lf.required_literal(regex)
+        parsed = sre_parse.parse(regex)
+        for _ in range(5):
+            text = "so " + generate(parsed, rng) + " then"
+            if re.search(regex, text):
+                assert literal in text, (regex, literal, text)
+
+
+def test_arg_lexicon_counts_match_baseline():
+    rng = random.Random(1)
+    patterns = lexicon_patterns()
+    texts = [
+        " ".join(
+            generate(sre_parse.parse(regex), rng) for regex in rng.sample(patterns, 20)
+        )
+        for _ in range(20)
+    ]
+    texts.append("")
+    for text in texts:
+        assert lf.arg_lexicon_counts(text) == [
+            baseline_arg_lexicon_check(text, path) for path in lexicon_paths
+        ]
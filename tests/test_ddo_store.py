@@ -0,0 +1,25 @@
+import numpy as np
+
+from data_processing import debate_columns, filter_category, load_users
+from data_processing import stream_debates
+from ddo_store import DDOStore, convert
+from synthetic_data import SyntheticDDO
+from user_features import UserTable
+
+
+def test_debate_columns_match_json(tmp_path):
+    SyntheticDDO(200, 80, voters_per_debate=12, seed=0).write(str(tmp_path))
+    store = DDOStore(convert(str(tmp_path)))
+    users = load_users(str(tmp_path / "users.json"))
+    debates = dict(stream_debates(str(tmp_path / "debates.json"), users))
+    user_table = UserTable(users)
+    assert len(store.select(min_votes=10)) > 0
+    for category in (None, "Politics"):
+        expected = debate_columns(
+            filter_category(debates, category), users, user_table.ids
+        )
+        columns = store.debate_columns([category] if category else None)
+        assert columns[0] == expected[0]
+        assert list(columns[1]) == expected[1]
+        for array, expected_array in zip(columns[2:], expected[2:]):
+            np.testing.assert_array_equal(array, expected_array)
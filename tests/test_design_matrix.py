@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.preprocessing import StandardScaler
+
+from design_matrix import DesignMatrix
+
+
+def matrix(seed=0, n_debates=30):
+    """
+    Returns a design matrix of debates with uneven numbers of votes, with
+    constant columns in its per-sample, per-debate and sparse TF-IDF blocks.
+    """
+    rng = np.random.default_rng(seed)
+    vote_counts = rng.integers(1, 12, size=n_debates)
+    debate_index = np.repeat(np.arange(n_debates), vote_counts)
+    sample_block = rng.normal(size=(len(debate_index), 4))
+    sample_block[:, 1] = 3.0
+    pro = rng.normal(size=(n_debates, 3))
+    pro[:, 2] = 0.1
+    tfidf = rng.random((n_debates, 6)) * (rng.random((n_debates, 6)) < 0.3)
+    # A column that is all zeros, and so constant
+    tfidf[:, 4] = 0
+    tfidf = sparse.csr_matrix(tfidf)
+    con = rng.normal(size=(n_debates, 2))
+    return DesignMatrix(sample_block, [pro, tfidf, con], debate_index)
+
+
+def expected_scaling(X):
+    """
+    Returns the expanded matrix scaled by StandardScaler, without centering
+    the sparse columns, and the means and scales it used.
+    """
+    dense = X.take(np.arange(len(X)))
+    dense = dense.toarray() if sparse.issparse(dense) else dense
+    sparse_columns = np.zeros(X.shape[1], dtype=bool)
+    for block, start, end in zip(X.blocks(), X.offsets[:-1], X.offsets[1:]):
+        sparse_columns[start:end] = sparse.issparse(block)
+    scaled = np.empty_like(dense)
+    mean = np.zeros(X.shape[1])
+    scale = np.ones(X.shape[1])
+    for columns, with_mean in [(~sparse_columns, True), (sparse_columns, False)]:
+        if not columns.any():
+            continue
+        scaler = StandardScaler(with_mean=with_mean)
+        if with_mean:
+            scaled[:, columns] = scaler.fit_transform(dense[:, columns])
+            mean[columns] = scaler.mean_
+        else:
+            block = sparse.csr_matrix(dense[:, columns])
+            scaled[:, columns] = scaler.fit_transform(block).toarray()
+        scale[columns] = scaler.scale_
+    return scaled, mean, scale
+
+
+def dense_take(X, rows, columns=None):
+    taken = X.take(rows, columns)
+    return taken.toarray() if sparse.issparse(taken) else taken
+
+
+def test_standardize_matches_standard_scaler():
+    X = matrix()
+    expected, expected_mean, expected_scale = expected_scaling(X)
+    mean, scale = X.standardize()
+    np.testing.assert_allclose(dense_take(X, np.arange(len(X))), expected, atol=1e-12)
+    np.testing.assert_allclose(mean, expected_mean, atol=1e-12)
+    np.testing.assert_allclose(scale, expected_scale, rtol=1e-12)
+    # Constant columns are centered but not scaled
+    for column in [1, 6, 11]:
+        assert scale[column] == 1.0
+        np.testing.assert_allclose(expected[:, column], 0, atol=1e-12)
+    assert sparse.issparse(X.debate_blocks[1])
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_standardize_subset_matches_standard_scaler(seed):
+    X = matrix(seed)
+    rng = np.random.default_rng(seed)
+    # Rows of a fold, which may leave debates without any sample
+    rows = np.sort(rng.choice(len(X), size=len(X) // 3, replace=False))
+    subset = X.subset(rows)
+    expected, _, _ = expected_scaling(subset)
+    subset.standardize()
+    np.testing.assert_allclose(
+        dense_take(subset, np.arange(len(rows))), expected, atol=1e-12
+    )
+    # The debate blocks of X are shared, not scaled in place
+    np.testing.assert_array_equal(X.debate_blocks[0], matrix(seed).debate_blocks[0])
+
+
+def test_take_selects_rows_and_columns_of_the_scaled_matrix():
+    X = matrix(3)
+    expected, _, _ = expected_scaling(X)
+    X.standardize()
+    rows = np.array([5, 0, 17, 17, len(X) - 1])
+    columns = np.array([0, 1, 4, 7, 9, 13, 14])
+    taken = X.take(rows, columns)
+    assert sparse.issparse(taken)
+    np.testing.assert_allclose(
+        taken.toarray(), expected[np.ix_(rows, columns)], atol=1e-12
+    )
+    # Only dense columns, which are returned as an array
+    np.testing.assert_allclose(
+        X.take(rows, columns[:3]), expected[np.ix_(rows, columns[:3])], atol=1e-12
+    )
@@ -0,0 +1,119 @@
+import pytest
+
+import main
+from feature_cache import TextFeatureCache, extractor_fingerprint, text_hash
+
+# Feature groups computed from the raw texts, without the NLTK tokenizer data
+groups = ["links", "arg_lex"]
+
+
+def debate_texts(n_debates=12):
+    texts = [
+        [
+            "I think http://a%d.com shows it. Maybe not." % idx,
+            "It is clear that " * (idx % 4) + "you must agree.",
+        ]
+        for idx in range(n_debates)
+    ]
+    # A repeated debate is computed once
+    return texts + texts[:2]
+
+
+def counting_extraction(monkeypatch):
+    """
+    Wraps the extraction of LogRegModel.text_features, returning the list
+    the number of debates of every chunk it computes is appended to.
+    """
+    computed = []
+    extract = main.extract_text_features
+
+    def counted(chunks, workers=1):
+        for chunk in extract(chunks, workers):
+            computed.append(len(chunk))
+            yield chunk
+
+    monkeypatch.setattr(main, "extract_text_features", counted)
+    return computed
+
+
+def test_cache_hit(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    keys = [text_hash(["pro text", "con text"]), text_hash(["con text", "pro text"])]
+    assert keys[0] != keys[1]
+    cache = TextFeatureCache(path)
+    cache.put_many([(keys[0], {"links": [1, 0], "length": [3, 4]})])
+    cache.close()
+
+    cache = TextFeatureCache(path)
+    assert cache.fingerprint == extractor_fingerprint()
+    assert cache.get_many(keys, "links") == {keys[0]: [1, 0]}
+    assert cache.get_many(keys, "length") == {keys[0]: [3, 4]}
+    assert cache.get_many(keys, "arg_lex") == {}
+    cache.close()
+
+
+def test_changed_fingerprint_purges_stale_rows(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    key = text_hash(["pro text", "con text"])
+    cache = TextFeatureCache(path, fingerprint="old")
+    cache.put_many([(key, {"links": [1, 0]})])
+    cache.close()
+
+    cache = TextFeatureCache(path, fingerprint="new")
+    assert cache.get_many([key], "links") == {}
+    count = cache.connection.execute("SELECT COUNT(*) FROM group_features")
+    assert count.fetchone()[0] == 0
+    cache.close()
+
+    # The stale rows are gone, not just hidden
+    cache = TextFeatureCache(path, fingerprint="old")
+    assert cache.get_many([key], "links") == {}
+    cache.close()
+
+
+def test_text_features_hit_cache(tmp_path, monkeypatch):
+    computed = counting_extraction(monkeypatch)
+    model = main.LogRegModel(None, str(tmp_path / "cache.sqlite"), chunk_size=5)
+    texts = debate_texts()
+    features = model.text_features(texts, groups)
+    assert sum(computed) == 12
+    assert features[12] == features[0]
+    assert set(features[0]) == set(groups)
+
+    del computed[:]
+    assert model.text_features(texts, groups) == features
+    assert computed == []
+
+    # A subset of the cached groups is read from the cache as well
+    assert model.text_features(texts, ["links"]) == [
+        {"links": values["links"]} for values in features
+    ]
+    assert computed == []
+
+
+def test_interrupted_extraction_resumes(tmp_path, monkeypatch):
+    texts = debate_texts()
+    expected = main.LogRegModel(None, str(tmp_path / "full.sqlite")).text_features(
+        texts, groups
+    )
+    extract = main.extract_text_features
+    committed = []
+
+    def interrupted(chunks, workers=1):
+        # Stop once the first chunk has been handed back to be committed
+        chunk = next(extract(chunks, workers))
+        committed.append(len(chunk))
+        yield chunk
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(main, "extract_text_features", interrupted)
+    model = main.LogRegModel(None, str(tmp_path / "cache.sqlite"), chunk_size=5)
+    with pytest.raises(KeyboardInterrupt):
+        model.text_features(texts, groups)
+
+    # Only the debates of the chunks that were not committed are computed
+    monkeypatch.setattr(main, "extract_text_features", extract)
+    computed = counting_extraction(monkeypatch)
+    assert model.text_features(texts, groups) == expected
+    assert committed[0] > 0
+    assert sum(computed) == 12 - committed[0]
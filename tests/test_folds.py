@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from design_matrix import DesignMatrix
+from folds import FoldCache, stream_folds
+from main import cv_splits
+from streaming import fit_scaler, row_batches
+from user_features import UserTable
+
+
+def dense(X):
+    return X.toarray() if sparse.issparse(X) else X
+
+
+def matrix(rng, n_samples, n_debates, sparse_block):
+    debate_block = rng.normal(size=(n_debates, 3))
+    if sparse_block:
+        debate_block = sparse.random(
+            n_debates, 4, density=0.3, format="csr", random_state=0
+        )
+    debate_block2 = np.ones((n_debates, 2))
+    return DesignMatrix(
+        rng.normal(size=(n_samples, 4)),
+        [debate_block, debate_block2],
+        rng.integers(n_debates, size=n_samples),
+    )
+
+
+@pytest.mark.parametrize("sparse_block", [False, True])
+def test_stream_folds_scalers_match_fit_scaler(tmp_path, synthetic, sparse_block):
+    users, _ = synthetic
+    user_table = UserTable(users)
+    rng = np.random.default_rng(0)
+    X = matrix(rng, 503, 40, sparse_block)
+    stored = DesignMatrix.write(
+        str(tmp_path),
+        row_batches(X.sample_block, 100),
+        X.sample_block.shape,
+        X.debate_blocks,
+        X.debate_index,
+    )
+    rows = np.arange(503)
+    np.testing.assert_array_equal(dense(stored.take(rows)), dense(X.take(rows)))
+    Y = rng.integers(2, size=503)
+    voters = rng.integers(len(user_table), size=503)
+    folds = stream_folds(stored, Y, voters, user_table, cv_splits(503), 64)
+    for fold, (train_idx, test_idx) in zip(folds, cv_splits(503)):
+        np.testing.assert_array_equal(fold.train_idx, np.sort(train_idx))
+        load = fold.loader(stored, Y, voters, user_table, fold.train_counts)
+        expected = fit_scaler(load, row_batches(fold.train_idx, 64))
+        np.testing.assert_allclose(fold.scaler.mean_, expected.mean_, atol=1e-12)
+        np.testing.assert_allclose(fold.scaler.var_, expected.var_, atol=1e-12)
+        np.testing.assert_allclose(fold.scaler.scale_, expected.scale_, atol=1e-12)
+        assert fold.scaler.with_mean == (not sparse_block)
+
+
+def test_fold_cache_key(synthetic):
+    users, _ = synthetic
+    user_table = UserTable(users)
+    rng = np.random.default_rng(1)
+    X = matrix(rng, 120, 10, False)
+    Y = rng.integers(2, size=120)
+    voters = rng.integers(len(user_table), size=120)
+    cache = FoldCache()
+    splits = cv_splits(120)
+    folds = cache.get(X, Y, voters, user_table, splits)
+    assert cache.get(X, Y, voters, user_table, cv_splits(120)) is folds
+    # Other splits or batch sizes of the same dataset get their own folds
+    other_splits = [(test_idx, train_idx) for train_idx, test_idx in splits]
+    assert cache.get(X, Y, voters, user_table, other_splits) is not folds
+    streamed = cache.get(X, Y, voters, user_table, splits, 32)
+    assert streamed is not folds
+    assert cache.get(X, Y, voters, user_table, splits, 64) is not streamed
+    assert cache.get(X, Y, voters, user_table, splits, 32) is streamed
@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pytest
+
+from data_processing import iter_json_object
+
+
+def random_value(rng, depth=0):
+    kind = rng.integers(8 if depth < 3 else 5)
+    if kind == 0:
+        return int(rng.integers(-(10**6), 10**6))
+    if kind == 1:
+        return float(rng.normal() * 10.0 ** rng.integers(-5, 12))
+    if kind == 2:
+        return [None, True, False][rng.integers(3)]
+    if kind in (3, 4):
+        # Strings with braces, brackets, separators and escaped characters
+        pieces = ["{", "}", "[", "]", '"', "\\", ",", ":", " ", "\n", "é", "ab", "12"]
+        return "".join(rng.choice(pieces, size=rng.integers(0, 8)))
+    if kind == 5:
+        return [random_value(rng, depth + 1) for _ in range(rng.integers(0, 4))]
+    return {
+        random_value(rng, 3) if kind == 6 else "k%d" % idx: random_value(rng, depth + 1)
+        for idx in range(rng.integers(0, 4))
+    }
+
+
+def random_object(seed):
+    rng = np.random.default_rng(seed)
+    return {
+        'key {%d} "%d"' % (idx, seed) if idx % 2 else "k%d" % idx: random_value(rng)
+        for idx in range(rng.integers(0, 12))
+    }
+
+
+def write(tmp_path, text):
+    path = tmp_path / "data.json"
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 16, 64])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_matches_json_load(tmp_path, chunk_size, indent):
+    for seed in range(20):
+        path = write(tmp_path, json.dumps(random_object(seed), indent=indent))
+        with open(path) as f:
+            expected = list(json.load(f).items())
+        assert list(iter_json_object(path, chunk_size=chunk_size)) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64])
+def test_fields_keep_only_the_given_keys(tmp_path, chunk_size):
+    data = {
+        "a": {"keep": '}{"', "drop": {"keep": 1}, "other": [1, 2]},
+        "b": {},
+        "c": {"drop": "x", "keep": 12345},
+    }
+    path = write(tmp_path, json.dumps(data))
+    assert list(iter_json_object(path, ["keep", "other"], chunk_size)) == [
+        ("a", {"keep": '}{"', "other": [1, 2]}),
+        ("b", {}),
+        ("c", {"keep": 12345}),
+    ]
+
+
+@pytest.mark.parametrize("text", ["{}", " \n{ }\n", '{"a": {}}', '{"": {}, "b": []}'])
+@pytest.mark.parametrize("chunk_size", [1, 2, 64])
+def test_empty_objects(tmp_path, text, chunk_size):
+    path = write(tmp_path, text)
+    with open(path) as f:
+        expected = list(json.load(f).items())
+    assert list(iter_json_object(path, chunk_size=chunk_size)) == expected
+
+
+def test_not_an_object(tmp_path):
+    with pytest.raises(ValueError):
+        list(iter_json_object(write(tmp_path, "[1, 2]")))
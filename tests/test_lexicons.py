@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import language_features as lf
+
+
+def baseline_counts(tokens):
+    # Lexicon features as computed per text before lexicon_counter
+    return [
+        lf.get_lexicon_features(tokens, lf.opponent_words),
+        lf.get_lexicon_features(tokens, lf.hedges),
+        lf.get_lexicon_features(tokens, lf.evidence_list),
+        lf.get_lexicon_features(tokens, lf.read_word_list(lf.offensive_filename)),
+        lf.get_lexicon_features(tokens, lf.read_word_list(lf.pos_filename)),
+        lf.get_lexicon_features(tokens, lf.read_word_list(lf.neg_filename)),
+        *lf.person_count(tokens),
+        *lf.get_modals(tokens),
+        lf.get_lexicon_features(tokens, ["!"]),
+    ]
+
+
+def random_texts(seed=0, n_texts=50):
+    rng = np.random.default_rng(seed)
+    words = sorted(
+        set(lf.opponent_words)
+        | set(lf.evidence_list)
+        | set(lf.hedges)
+        | set(lf.modal_verbs)
+        | set(sum(lf.pronoun_lexicons, []))
+    )
+    words = [word for word in words if " " not in word]
+    words += sorted(lf.read_word_list(lf.pos_filename))[:50]
+    words += sorted(lf.read_word_list(lf.neg_filename))[:50]
+    words += ["!", "?", ".", "the", "debate", "Opponent", "MUST", "According"]
+    texts = []
+    for _ in range(n_texts):
+        tokens = list(rng.choice(words, size=rng.integers(0, 80)))
+        # Splice in the words of phrase entries, which are counted by word
+        phrases = [phrase for phrase in lf.hedges + lf.evidence_list if " " in phrase]
+        for phrase in rng.choice(phrases, size=3):
+            at = rng.integers(len(tokens) + 1)
+            tokens[at:at] = phrase.split()
+        texts.append([str(token) for token in tokens])
+    return texts
+
+
+def test_counter_matches_baseline():
+    texts = random_texts()
+    np.testing.assert_array_equal(
+        lf.lexicon_counter().transform(texts),
+        [baseline_counts(tokens) for tokens in texts],
+    )
+
+
+@pytest.mark.parametrize(
+    "tokens,group,expected",
+    [
+        # "according to" is counted once, by its first word
+        (["According", "to", "the", "report"], "evidence", [1]),
+        (["according", "to", "according", "to"], "evidence", [2]),
+        # Hedge phrases never match as a whole, nor do their words
+        (["In", "my", "opinion", ",", "in", "general"], "politeness", [0]),
+        (["to", "my", "knowledge", "I", "think"], "politeness", [1]),
+        (["certain", "amount"], "politeness", [0]),
+        ([], "evidence", [0]),
+    ],
+)
+def test_counter_phrases(tokens, group, expected):
+    counts = lf.lexicon_counter().transform([tokens])[0]
+    assert list(counts[lf.lexicon_slices[group]]) == expected
+    assert list(counts) == baseline_counts(tokens)
+
+
+def test_counter_lexicon_entries_are_single_tokens():
+    # A token is looked up as is after lowercasing, as in get_lexicon_features
+    lexicons = [["according to", "according"], ["A"]]
+    texts = [["according", "to"], ["according to"], ["a", "A"]]
+    np.testing.assert_array_equal(
+        lf.LexiconCounter(lexicons).transform(texts),
+        [[lf.get_lexicon_features(text, lex) for lex in lexicons] for text in texts],
+    )
@@ -0,0 +1,31 @@
+from profiling import Profiler, StageReport, null_timer
+
+
+def test_disabled_stages_ignore_counts():
+    with Profiler().stage("extract") as timer:
+        timer.tokens = 10
+        timer.calls = 2
+    with StageReport().stage("load") as stage:
+        stage.rows = 5
+    assert timer is stage is null_timer
+    assert (null_timer.rows, null_timer.calls, null_timer.tokens) == (0, 0, 0)
+    assert vars(null_timer) == {}
+
+
+def test_enabled_stage_records_counts():
+    profiler = Profiler()
+    profiler.enable()
+    with profiler.stage("extract", rows=4) as timer:
+        timer.tokens = 10
+    with profiler.stage("extract", calls=2, rows=3):
+        pass
+    report = profiler.report()["extract"]
+    assert (report["calls"], report["tokens"], report["rows"]) == (3, 10, 7)
+
+    # Stats of a worker process are merged into those of the parent
+    parent = Profiler()
+    parent.enable()
+    parent.merge(profiler.take())
+    parent.merge({"extract": [1.0, 0.5, 1, 0, 2]})
+    assert parent.report()["extract"]["calls"] == 4
+    assert parent.report()["extract"]["rows"] == 9
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from design_matrix import DesignMatrix
+from main import filter_samples, sample_rows
+
+
+def baseline_filter_samples(Y, majority_threshold, draws):
+    # The sampling loop of filter_samples before it was vectorized, given the
+    # random draws of each sample
+    zero_count = (Y == 1).sum() / (1 - majority_threshold) - (Y == 1).sum()
+    kept, ctr = [], 0
+    for idx, label in enumerate(Y):
+        if label == 1:
+            kept.append(idx)
+        elif ctr < zero_count and draws[idx]:
+            kept.append(idx)
+            ctr += 1
+    return kept
+
+
+def labels(seed=0, size=1000, positives=0.2):
+    return (np.random.default_rng(seed).random(size) < positives).astype(int)
+
+
+@pytest.mark.parametrize(
+    "majority_threshold,randomness_threshold,positives",
+    [(0.5, 0.5, 0.2), (0.7, 0.3, 0.1), (0.5, 0.5, 0.45), (0.9, 0.5, 0.2)],
+)
+def test_filter_samples_matches_loop(
+    majority_threshold, randomness_threshold, positives
+):
+    Y = labels(positives=positives)
+    draws = np.random.default_rng(7).random(len(Y)) > randomness_threshold
+    rows = filter_samples(Y, majority_threshold, randomness_threshold, seed=7)
+    np.testing.assert_array_equal(
+        rows, baseline_filter_samples(Y, majority_threshold, draws)
+    )
+
+    # Every positive is kept, with as many negatives as wanted and available
+    ones = np.count_nonzero(Y)
+    wanted = np.ceil(ones / (1 - majority_threshold) - ones)
+    available = np.count_nonzero((Y == 0) & draws)
+    np.testing.assert_array_equal(
+        np.intersect1d(rows, np.flatnonzero(Y)), np.flatnonzero(Y)
+    )
+    assert len(rows) == ones + min(wanted, available)
+
+
+def test_filter_samples_seed():
+    Y = labels()
+    rows = filter_samples(Y, seed=3)
+    np.testing.assert_array_equal(filter_samples(Y, seed=3), rows)
+    assert not np.array_equal(filter_samples(Y, seed=4), rows)
+
+
+def test_sample_rows_keeps_x_and_y_aligned():
+    n_debates = 40
+    rng = np.random.default_rng(0)
+    debate_index = np.repeat(np.arange(n_debates), rng.integers(5, 30, n_debates))
+    Y = labels(size=len(debate_index))
+    voters = rng.integers(1000, size=len(debate_index))
+    # The first column of a row is its index, the last its debate
+    X = DesignMatrix(
+        np.arange(len(Y), dtype=float)[:, None],
+        [np.arange(n_debates, dtype=float)[:, None]],
+        debate_index,
+    )
+    options = SimpleNamespace(seed=5, majority_threshold=0.5, randomness_threshold=0.5)
+    rows = sample_rows(Y, options)
+    np.testing.assert_array_equal(sample_rows(Y, options), rows)
+    # Rows are shuffled, not sorted, and none is repeated
+    assert len(np.unique(rows)) == len(rows)
+    assert not np.all(np.diff(rows) > 0)
+    assert set(np.flatnonzero(Y)) <= set(rows)
+
+    subset, Y_subset, voters_subset = X.subset(rows), Y[rows], voters[rows]
+    expanded = subset.take(np.arange(len(rows)))
+    np.testing.assert_array_equal(expanded[:, 0], rows)
+    np.testing.assert_array_equal(expanded[:, 1], debate_index[rows])
+    np.testing.assert_array_equal(Y_subset, Y[expanded[:, 0].astype(int)])
+    np.testing.assert_array_equal(voters_subset, voters[expanded[:, 0].astype(int)])
@@ -0,0 +1,53 @@
+import itertools
+
+import nltk
+
+import language_features as lf
+
+
+def baseline_includes_sentiment_words(
+    text, mpqa_lexicon_dic, priorpolarity="positive", polarity_type="strongsubj"
+):
+    # includes_sentiment_words before the single-pass subjectivity_counts
+    count = 0
+    for tok in nltk.pos_tag(text):
+        pos = "none"
+        if tok[1] == "NN" or tok[1] == "NNP" or tok[1] == "NNS":
+            pos = "noun"
+        if tok[1] in ("VB", "VBD", "VBG", "VBN", "VBP", "VBZ"):
+            pos = "verb"
+        if tok[1] == "JJR" or tok[1] == "JJS" or tok[1] == "JJ":
+            pos = "adj"
+        for key in ((tok[0].lower(), pos), (tok[0].lower(), "anypos")):
+            if key in mpqa_lexicon_dic:
+                if (
+                    mpqa_lexicon_dic[key]["type"] == polarity_type
+                    and mpqa_lexicon_dic[key]["priorpolarity"] == priorpolarity
+                ):
+                    count += 1
+    return count
+
+
+def fake_pos_tag(tokens):
+    # Deterministic tags covering every POS of the table, so the test does not
+    # need the NLTK tagger data
+    tags = itertools.cycle(["NN", "VBZ", "JJ", "RB", "NNS", "VBD", "JJS", "DT"])
+    return [(token, tag) for token, tag in zip(tokens, tags)]
+
+
+def test_subjectivity_counts_match_baseline(monkeypatch):
+    monkeypatch.setattr(nltk, "pos_tag", fake_pos_tag)
+    lexicon_dic = lf.read_mpqa_data()
+    # Words of every bucket, with and without a POS of their own
+    words = [word for word, _ in list(lexicon_dic)[::37]]
+    texts = [words[i : i + 50] for i in range(0, len(words), 50)]
+    texts.append(["The", "ABANDONED", "abasement", "won't", "."])
+    texts.append([])
+    for text in texts:
+        expected = [
+            baseline_includes_sentiment_words(text, lexicon_dic, *bucket)
+            for bucket in lf.subjectivity_buckets
+        ]
+        assert lf.subjectivity_counts(text) == expected
+        for idx, bucket in enumerate(lf.subjectivity_buckets):
+            assert lf.includes_sentiment_words(text, *bucket) == expected[idx]
@@ -0,0 +1,19 @@
+import numpy as np
+
+from main import LogRegModel
+
+
+def test_fit_ignores_init_of_other_columns():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 5))
+    Y = (X[:, 0] + rng.normal(size=200) > 0).astype(int)
+    model = LogRegModel(None)
+    cold_iter = model.fit(X, Y)
+    cold_coef = model.model.coef_.copy()
+
+    # Coefficients of 6 columns can't seed a fit on 5, so it starts cold
+    assert model.fit(X, Y, (np.ones(6), 0.0)) == cold_iter
+    np.testing.assert_array_equal(model.model.coef_, cold_coef)
+
+    # Starting from the optimum converges at once
+    assert model.fit(X, Y, (cold_coef[0], model.model.intercept_[0])) <= cold_iter
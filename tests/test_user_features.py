@@ -0,0 +1,101 @@
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from user_features import (
+    UserTable,
+    build_bigissues_dict,
+    get_bigissues,
+    get_decidedness,
+    get_gender,
+    get_matching,
+    get_persuadability,
+)
+
+
+def baseline_get_bigissues(issues_dict, voter_name, debater_name):
+    # get_bigissues before the vectorized bigissues_similarity
+    sims = []
+    for v, d in zip(issues_dict[voter_name], issues_dict[debater_name]):
+        sims.append(cosine_similarity([v], [d]))
+    return np.mean(sims)
+
+
+def votes(users, seed=0, size=100):
+    rng = np.random.default_rng(seed)
+    names = list(users)
+    return [
+        [names[idx] for idx in rng.integers(len(names), size=size)] for _ in range(3)
+    ]
+
+
+def test_bigissues_match_baseline(synthetic):
+    users, _ = synthetic
+    issues_dict = build_bigissues_dict(users)
+    table = UserTable(users, issues_dict)
+    voters, debaters, _ = votes(users)
+    expected = [
+        baseline_get_bigissues(issues_dict, v, d) for v, d in zip(voters, debaters)
+    ]
+    np.testing.assert_allclose(
+        [get_bigissues(issues_dict, v, d) for v, d in zip(voters, debaters)],
+        expected,
+        rtol=1e-12,
+        atol=1e-15,
+    )
+    np.testing.assert_allclose(
+        table.opinion(
+            table.lookup(voters), table.lookup(debaters), table.lookup(debaters)
+        )[:, 0],
+        expected,
+        rtol=1e-12,
+        atol=1e-15,
+    )
+
+
+def test_pair_features_match_baseline(synthetic):
+    users, _ = synthetic
+    issues_dict = build_bigissues_dict(users)
+    table = UserTable(users, issues_dict)
+    voters, debaters1, debaters2 = votes(users, seed=1)
+    features = table.pair_features(
+        table.lookup(voters), table.lookup(debaters1), table.lookup(debaters2)
+    )
+    for row, voter, d1, d2 in zip(features, voters, debaters1, debaters2):
+        expected = [
+            baseline_get_bigissues(issues_dict, voter, d1),
+            baseline_get_bigissues(issues_dict, voter, d2),
+            get_matching(users, voter, d1, "Politics"),
+            get_matching(users, voter, d2, "Politics"),
+            get_matching(users, voter, d1, "Religion"),
+            get_matching(users, voter, d2, "Religion"),
+            *get_decidedness(issues_dict, voter),
+            *get_gender(users, voter, d1, d2),
+        ]
+        np.testing.assert_allclose(row, expected, rtol=1e-12, atol=1e-15)
+
+
+def test_pair_features_groups_select_columns(synthetic):
+    users, _ = synthetic
+    table = UserTable(users)
+    ids = [table.lookup(names) for names in votes(users, seed=2, size=50)]
+    full = table.pair_features(*ids)
+    np.testing.assert_array_equal(
+        table.pair_features(*ids, groups=["decidedness", "undecidedness", "gender"]),
+        full[:, 6:],
+    )
+    assert table.pair_features(*ids, groups=["persuade"]).shape == (50, 0)
+
+
+def test_persuadability_matches_baseline(synthetic):
+    users, _ = synthetic
+    table = UserTable(users)
+    debate_voters = votes(users, seed=3, size=2000)[0]
+    expected = [get_persuadability(users, debate_voters, v) for v in debate_voters]
+    voter_ids = table.lookup(debate_voters)
+    np.testing.assert_array_equal(table.persuadability(voter_ids), expected)
+
+    # Scores within a larger set of voters, as for the rows of a batch
+    counts = table.persuade_counts(voter_ids)
+    np.testing.assert_array_equal(
+        table.persuadability(voter_ids[:100], counts), expected[:100]
+    )